@@ -1,7 +1,24 @@
 import json
-from app.utils.extract_text import extract_text_from_file
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from app.utils import metrics
+from app.utils.extract_text import count_tokens
+from app.utils.lab_parser import parse_lab_values
+from app.utils.pdf_extract import extract_pages
 from app.services.openai_services import call_openai
 
+# Largest slice of report text sent in one extraction prompt, and how many
+# slices of one report are extracted at the same time
+REPORT_SECTION_TOKEN_BUDGET = int(os.getenv("REPORT_SECTION_TOKEN_BUDGET", "6000"))
+REPORT_SECTION_CONCURRENCY = int(os.getenv("REPORT_SECTION_CONCURRENCY", "4"))
+
+lab_parse_coverage = metrics.histogram("lab_parse_coverage", [0.1, 0.25, 0.5, 0.75, 0.9, 1.0])
+report_sections = metrics.histogram("report_sections", [1, 2, 4, 8, 16, 32])
+
 
 class HealthReportAgent:
     """
@@ -22,32 +39,90 @@ class HealthReportAgent:
         """
         self.rag_chain = rag_chain
 
-    def parse_report(self, file_path: str) -> str:
+    def parse_report(self, file_path: str, digest: Optional[str] = None) -> List[str]:
         """
-        Extracts raw text from a given PDF or document file.
+        Extracts raw text from a given PDF or document file, one string per page.
 
         Args:
             file_path (str): Local path to the uploaded health report.
+            digest (str, optional): SHA-256 of the file, if already known.
 
         Returns:
-            str: Extracted plain text from the file.
+            List[str]: Plain text of each page, in order.
         """
-        return extract_text_from_file(file_path)
+        return extract_pages(file_path, digest=digest)
 
     def estimate_tokens(self, text: str) -> int:
         """
-        Roughly estimates the number of tokens in a given string. 
-        (Assumes 1 token ≈ 4 characters, per OpenAI guidance.)
+        Counts the tokens in a given string with the model's tokenizer.
 
         Args:
             text (str): Text content.
 
         Returns:
-            int: Estimated token count.
+            int: Token count.
+        """
+        return count_tokens(text)
+
+    def split_sections(self, blocks: List[str], budget: int = REPORT_SECTION_TOKEN_BUDGET) -> List[str]:
         """
-        return len(text) // 4
+        Packs consecutive text blocks (pages, or lines) into sections of at most
+        `budget` tokens without splitting a block. A block that is larger than
+        the budget on its own is split on line boundaries.
 
-    def extract_medical_info(self, report_text: str) -> dict:
+        Args:
+            blocks (List[str]): Text blocks in report order.
+            budget (int): Token budget per section.
+
+        Returns:
+            List[str]: Sections in report order.
+        """
+        sections, current, used = [], [], 0
+        for block in blocks:
+            tokens = self.estimate_tokens(block)
+            if tokens > budget and "\n" in block.strip():
+                pieces = self.split_sections(block.strip().splitlines(), budget)
+            else:
+                pieces = [block]
+            for piece in pieces:
+                piece_tokens = tokens if len(pieces) == 1 else self.estimate_tokens(piece)
+                if current and used + piece_tokens > budget:
+                    sections.append("\n".join(current))
+                    current, used = [], 0
+                current.append(piece)
+                used += piece_tokens
+        if current:
+            sections.append("\n".join(current))
+        return sections
+
+    def map_sections(self, extract: Callable[[str], dict], sections: List[str]) -> dict:
+        """
+        Runs `extract` on every section, at most REPORT_SECTION_CONCURRENCY at a
+        time, and merges the partial results in section order: the first
+        section that reports a value wins, so the output does not depend on
+        which call finishes first.
+
+        Args:
+            extract (Callable): Section text → {"report_values"}.
+            sections (List[str]): Sections in report order.
+
+        Returns:
+            dict: Merged {"report_values"}.
+        """
+        report_sections.observe(len(sections))
+        if len(sections) == 1:
+            parts = [extract(sections[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(REPORT_SECTION_CONCURRENCY, len(sections))) as pool:
+                parts = list(pool.map(extract, sections))
+
+        merged = {"report_values": {}}
+        for part in parts:
+            for name, value in (part.get("report_values") or {}).items():
+                merged["report_values"].setdefault(name, value)
+        return merged
+
+    def extract_with_llm(self, report_text: str) -> dict:
         """
     Uses GPT to extract structured health values and findings from report text.
     - report_values: every lab analyte name + its exact value (and units) as written.
@@ -101,6 +176,131 @@ Output ONLY valid JSON, no commentary.  Follow this schema:
         {report_text}
         """
         return call_openai(prompt, return_type="json")
+
+    def extract_values(self, text: str) -> dict:
+        """
+        Uses GPT to read test results from one section of report text, without
+        interpreting them. Sections are extracted independently and merged, so
+        findings are left to a single `extract_findings` pass over the result.
+
+        Args:
+            text (str): A section of report text, or leftover lines the local
+                parser did not recognise.
+
+        Returns:
+            dict: {"report_values": { "<Test Name>": "<value>", … }}
+        """
+        prompt = f"""
+        You are a medical assistant. Read the lab test results in the text below.
+
+        Output ONLY valid JSON with report_values: a dictionary mapping every test name exactly as it appears (including any parentheses/units) to its value (including units). Ignore reference ranges. If there are no results, return an empty dictionary.
+
+        {{
+        "report_values": {{ "<Test Name>": "<value>" }}
+        }}
+
+        Here’s the text:
+        {text}
+        """
+        return call_openai(prompt, return_type="json")
+
+    def extract_findings(self, report_values: dict) -> dict:
+        """
+        Asks GPT to interpret a complete set of report values. Runs once per
+        report, after every section's values are merged.
+
+        Args:
+            report_values (dict): All values read from the report.
+
+        Returns:
+            dict: {"medical_findings": {
+                "<Finding summary>": {"detail": "<explanation>", "reason": "<values>"}, …
+            }}
+        """
+        prompt = f"""
+        You are a medical assistant. These lab values were read from a report:
+
+        {json.dumps(report_values, indent=2)}
+
+        Output ONLY valid JSON with medical_findings: short finding summary → {{"detail": "<clinical meaning>", "reason": "<which values support it>"}}.
+
+        {{
+        "medical_findings": {{
+            "<Finding summary>": {{ "detail": "<detailed explanation>", "reason": "<specific value(s) supporting this>" }}
+        }}
+        }}
+        """
+        return call_openai(prompt, return_type="json")
+
+    def extract_medical_info(self, report_text: str, stats: Optional[dict] = None,
+                             pages: Optional[List[str]] = None) -> dict:
+        """
+        Extracts report values and findings. Known analytes (LH, FSH, AMH,
+        testosterone, SHBG, HbA1c, insulin, TSH, lipids, …) are read by the
+        local parser; the LLM only reads the leftover lines and interprets the
+        values. A short report the parser finds nothing in goes to
+        `extract_with_llm` in one call.
+
+        Text sent to the LLM for values is cut into sections of at most
+        REPORT_SECTION_TOKEN_BUDGET tokens (page-aligned when `pages` is given)
+        that are extracted concurrently and merged; findings then come from
+        one `extract_findings` call over the merged values, so sections never
+        produce overlapping findings.
+
+        Args:
+            report_text (str): Cleaned text content from the report.
+            stats (dict, optional): Filled with parse coverage and prompt size.
+            pages (List[str], optional): The same text split by page.
+
+        Returns:
+            dict: Same shape as `extract_with_llm`.
+        """
+        start = time.perf_counter()
+        parsed = parse_lab_values(report_text)
+        parse_ms = (time.perf_counter() - start) * 1000
+
+        full_tokens = self.estimate_tokens(report_text)
+        values = parsed["report_values"]
+        if values:
+            sections = self.split_sections(parsed["unparsed_lines"])
+        else:
+            sections = self.split_sections(pages or [report_text])
+
+        if not values and len(sections) == 1:
+            # one call reads and interprets the whole report
+            result, sent_tokens = self.extract_with_llm(sections[0]), full_tokens
+        else:
+            # 1) values from each section; the local parser's reading wins
+            report_values = dict(values)
+            sent_tokens = 0
+            if sections:
+                extra = self.map_sections(self.extract_values, sections)
+                for name, value in extra["report_values"].items():
+                    report_values.setdefault(name, value)
+                sent_tokens += sum(self.estimate_tokens(section) for section in sections)
+
+            # 2) one findings pass over everything
+            findings = self.extract_findings(report_values)
+            sent_tokens += self.estimate_tokens(json.dumps(report_values))
+            result = {
+                "report_values": report_values,
+                "medical_findings": findings.get("medical_findings") or {},
+            }
+
+        lab_parse_coverage.observe(parsed["coverage"])
+        report = {
+            "parsed_values": len(values),
+            "unparsed_lines": len(parsed["unparsed_lines"]),
+            "coverage": round(parsed["coverage"], 3),
+            "parse_ms": round(parse_ms, 2),
+            "report_tokens": full_tokens,
+            "sections": len(sections),
+            "prompt_tokens_saved": max(0, full_tokens - sent_tokens),
+        }
+        print(f"🧪 Lab parser: {report}")
+        if stats is not None:
+            stats.update(report)
+        return result
         
     def generate_health_plan(self, health_data: dict) -> str:
         """
@@ -125,7 +325,23 @@ Output ONLY valid JSON, no commentary.  Follow this schema:
         """
         return call_openai(prompt)
 
-    def run(self, file_path: str):
+    @contextmanager
+    def _stage(self, name: str, timings: Optional[Dict[str, float]], on_stage: Optional[Callable[[str], None]]):
+        """
+        Times one pipeline stage into `timings[name]` (milliseconds).
+        """
+        if on_stage:
+            on_stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if timings is not None:
+                timings[name] = (time.perf_counter() - start) * 1000
+
+    def run(self, file_path: str, timings: Optional[Dict[str, float]] = None,
+            on_stage: Optional[Callable[[str], None]] = None,
+            digest: Optional[str] = None, extraction: Optional[dict] = None):
         """
         End-to-end pipeline to analyze a health report:
             1. Extract text from the uploaded file
@@ -135,22 +351,38 @@ Output ONLY valid JSON, no commentary.  Follow this schema:
 
         Args:
             file_path (str): Path to the uploaded report.
+            timings (dict, optional): Filled with per-stage durations in ms
+                ("parse", "extract", "advise").
+            on_stage (Callable, optional): Called with the stage name as each
+                stage starts, for progress reporting.
+            digest (str, optional): SHA-256 of the file, if already known.
+            extraction (dict, optional): A cached {"json_data", "parse_stats"}
+                for this file; parsing and extraction are skipped.
 
         Returns:
             dict: {
                 "json_data": extracted structured health values,
                 "gpt_response": health guidance from the assistant,
                 "docs": RAG source documents (if any),
+                "parse_stats": lab parser coverage and prompt tokens saved,
                 OR
                 "error": failure reason
             }
         """
-        report_text = self.parse_report(file_path)
-        approx_tokens = self.estimate_tokens(report_text)
-        print(f"🧠 Approximate tokens in report: {approx_tokens}")
-
         try:
-            medical_data = self.extract_medical_info(report_text)
+            if extraction is not None:
+                medical_data = extraction["json_data"]
+                parse_stats = extraction.get("parse_stats") or {}
+            else:
+                with self._stage("parse", timings, on_stage):
+                    pages = self.parse_report(file_path, digest=digest)
+                    report_text = "\n".join(pages).strip()
+                report_tokens = self.estimate_tokens(report_text)
+                print(f"🧠 Tokens in report: {report_tokens} across {len(pages)} pages")
+
+                parse_stats = {}
+                with self._stage("extract", timings, on_stage):
+                    medical_data = self.extract_medical_info(report_text, stats=parse_stats, pages=pages)
 
             message = f"""
 Here is some extracted medical data:
@@ -165,7 +397,8 @@ Can you please suggest:
 Respond with warmth and clarity.
             """.strip()
 
-            response, source_docs = self.rag_chain(message, mode="upload")
+            with self._stage("advise", timings, on_stage):
+                response, source_docs = self.rag_chain(message, mode="upload")
 
             sources = []
             seen = set()
@@ -185,7 +418,8 @@ Respond with warmth and clarity.
             return {
                 "json_data": medical_data,
                 "gpt_response": response,
-                "docs": sources
+                "docs": sources,
+                "parse_stats": parse_stats,
             }
 
         except Exception as e:
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import Dict, List
+
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue, PointStruct
+
+from app.conversation_memory import conversation_memory
+from app.rag import (
+    LOCAL_INDEX_DTYPE,
+    VECTOR_BACKEND,
+    aembed_query,
+    async_qdrant,
+    embed,
+    embed_query,
+    normalize_query,
+    qdrant,
+)
+from app.utils import metrics
+from app.utils.cache import LRUTTLCache
+from app.utils.extract_text import count_tokens
+from app.vector_store import LocalVectorStore
+
+CHAT_HISTORY_COLLECTION = os.getenv("CHAT_HISTORY_COLLECTION", "chat_history")
+CHAT_INDEX_DIR = os.getenv("CHAT_INDEX_DIR", "./index/chat")
+CHAT_HISTORY_TOP_K = int(os.getenv("CHAT_HISTORY_TOP_K", "8"))
+CHAT_HISTORY_MIN_SCORE = float(os.getenv("CHAT_HISTORY_MIN_SCORE", "0.3"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "800"))
+CHAT_INDEX_BATCH_SIZE = int(os.getenv("CHAT_INDEX_BATCH_SIZE", "32"))
+CHAT_INDEX_BATCH_WAIT_S = float(os.getenv("CHAT_INDEX_BATCH_WAIT_S", "1"))
+
+ROLES = {"user": "user", "ai": "assistant"}
+
+
+class ChatHistoryIndex:
+    """
+    Per-user vector index over stored chat messages.
+
+    Messages are enqueued as they are stored; a background thread embeds them
+    in batches (one forward pass per batch) and writes them to the index, so
+    each message is embedded exactly once. With the qdrant backend all users
+    share one collection filtered on a `user_id` payload index; with the local
+    backend each user gets a small `LocalVectorStore` under CHAT_INDEX_DIR.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait_s: float = 1.0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max_wait_s
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._collection_ready = False
+        self._local_stores = LRUTTLCache("chat_index_store", maxsize=256, ttl=3600)
+        self.indexed = metrics.counter("chat_index_messages")
+        self.failures = metrics.counter("chat_index_failures")
+        self.retrieved_tokens = metrics.histogram(
+            "chat_history_tokens", [50, 100, 200, 400, 800, 1600, 3200]
+        )
+
+    # ── writes ────────────────────────────────────────────────────────────
+    def enqueue(self, row: dict):
+        """`row` is a chat_messages row as returned by the insert."""
+        if not (row.get("message") or "").strip():
+            return
+        self._ensure_worker()
+        self._queue.put(row)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="chat-index", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[dict]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _local_store(self, user_id: int) -> LocalVectorStore:
+        store = self._local_stores.get(user_id)
+        if store is None:
+            store = LocalVectorStore(os.path.join(CHAT_INDEX_DIR, str(user_id)), dtype=LOCAL_INDEX_DTYPE)
+            self._local_stores.set(user_id, store)
+        return store
+
+    def _ensure_collection(self, dim: int):
+        if self._collection_ready:
+            return
+        collections = [col.name for col in qdrant.get_collections().collections]
+        if CHAT_HISTORY_COLLECTION not in collections:
+            qdrant.create_collection(
+                collection_name=CHAT_HISTORY_COLLECTION,
+                vectors_config={"size": dim, "distance": "Cosine"},
+            )
+            qdrant.create_payload_index(
+                collection_name=CHAT_HISTORY_COLLECTION,
+                field_name="user_id",
+                field_schema="integer",
+            )
+        self._collection_ready = True
+
+    def _write(self, rows: List[dict]):
+        vectors = embed([row["message"] for row in rows])
+        payloads = [
+            {
+                "user_id": row["user_id"],
+                "role": ROLES.get(row["sender"], "user"),
+                "content": row["message"],
+            }
+            for row in rows
+        ]
+
+        if VECTOR_BACKEND == "qdrant":
+            self._ensure_collection(len(vectors[0]))
+            qdrant.upsert(
+                collection_name=CHAT_HISTORY_COLLECTION,
+                points=[
+                    PointStruct(id=row["id"], vector=vec, payload=payload)
+                    for row, vec, payload in zip(rows, vectors, payloads)
+                ],
+            )
+        else:
+            by_user: Dict[int, list] = {}
+            for row, vec, payload in zip(rows, vectors, payloads):
+                by_user.setdefault(row["user_id"], []).append((str(row["id"]), vec, payload))
+            for user_id, items in by_user.items():
+                store = self._local_store(user_id)
+                store.create(len(vectors[0]))
+                ids, vecs, pls = zip(*items)
+                store.upsert(list(ids), list(vecs), list(pls))
+                store.commit()
+
+        self.indexed.inc(len(rows))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Unindexed messages are still covered by the rolling summary
+                self.failures.inc()
+                print(f"⚠️ Failed to index {len(batch)} chat messages: {e}")
+
+    # ── reads ─────────────────────────────────────────────────────────────
+    def search(self, user_id: int, query: str, top_k: int) -> List[tuple]:
+        """Returns (message_id, score, payload) for the user's closest messages."""
+        query_vec = embed_query(query)
+        if VECTOR_BACKEND == "qdrant":
+            results = qdrant.search(
+                collection_name=CHAT_HISTORY_COLLECTION,
+                query_vector=query_vec,
+                query_filter=self._user_filter(user_id),
+                limit=top_k,
+                with_payload=True,
+                with_vectors=False,
+            )
+            return [(int(hit.id), hit.score, hit.payload or {}) for hit in results]
+        hits = self._local_store(user_id).search(query_vec, top_k)
+        return [(int(pid), score, payload) for pid, score, payload in hits]
+
+    async def asearch(self, user_id: int, query: str, top_k: int) -> List[tuple]:
+        query_vec = await aembed_query(query)
+        if VECTOR_BACKEND == "qdrant":
+            results = await async_qdrant.search(
+                collection_name=CHAT_HISTORY_COLLECTION,
+                query_vector=query_vec,
+                query_filter=self._user_filter(user_id),
+                limit=top_k,
+                with_payload=True,
+                with_vectors=False,
+            )
+            return [(int(hit.id), hit.score, hit.payload or {}) for hit in results]
+        hits = await self._local_store(user_id).asearch(query_vec, top_k)
+        return [(int(pid), score, payload) for pid, score, payload in hits]
+
+    @staticmethod
+    def _user_filter(user_id: int) -> Filter:
+        return Filter(must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))])
+
+    def history(self, user_id: int, query: str) -> List[dict]:
+        """
+        Prompt history for a message that refers back to earlier chat: the
+        rolling summary, the last exchange, and the past turns most similar to
+        `query`, all within CHAT_HISTORY_TOKEN_BUDGET tokens and in the order
+        they were said.
+        """
+        mem = conversation_memory.load(user_id)
+        try:
+            hits = self.search(user_id, query, CHAT_HISTORY_TOP_K)
+        except Exception as e:
+            print(f"⚠️ Chat history search failed, using rolling memory: {e}")
+            return conversation_memory.history(user_id)
+        if mem is None and not hits:
+            return conversation_memory.history(user_id)
+        return self._compose(query, mem, hits)
+
+    async def ahistory(self, user_id: int, query: str) -> List[dict]:
+        """`history` with the async Supabase and Qdrant clients; both reads run at once."""
+        mem, hits = await asyncio.gather(
+            conversation_memory.aload(user_id),
+            self.asearch(user_id, query, CHAT_HISTORY_TOP_K),
+            return_exceptions=True,
+        )
+        if isinstance(mem, Exception):
+            raise mem
+        if isinstance(hits, Exception):
+            print(f"⚠️ Chat history search failed, using rolling memory: {hits}")
+            return conversation_memory.conversation(mem) if mem else await conversation_memory.ahistory(user_id)
+        if mem is None and not hits:
+            return await conversation_memory.ahistory(user_id)
+        return self._compose(query, mem, hits)
+
+    def _compose(self, query: str, mem, hits: List[tuple]) -> List[dict]:
+        budget = CHAT_HISTORY_TOKEN_BUDGET
+        conversation = []
+        if mem and mem["summary"]:
+            conversation.append({
+                "role": "system",
+                "content": f"Summary of earlier conversation:\n{mem['summary']}"
+            })
+            budget -= count_tokens(mem["summary"])
+
+        # the last exchange always goes in, it is what "as I said"/"above" usually means
+        turns: Dict[int, dict] = {}
+        asked = normalize_query(query)
+        for t in (mem["recent"][-2:] if mem else []):
+            if normalize_query(t["content"]) != asked:
+                turns[t["id"]] = {"role": t["role"], "content": t["content"]}
+        budget -= sum(count_tokens(t["content"]) for t in turns.values())
+
+        # then the most relevant earlier turns, best first, while they fit
+        for message_id, score, payload in hits:
+            if score < CHAT_HISTORY_MIN_SCORE or message_id in turns:
+                continue
+            content = payload.get("content", "")
+            if normalize_query(content) == asked:
+                continue  # the message being answered, indexed a moment ago
+            tokens = count_tokens(content)
+            if tokens > budget:
+                continue
+            turns[message_id] = {"role": payload.get("role", "user"), "content": content}
+            budget -= tokens
+
+        self.retrieved_tokens.observe(CHAT_HISTORY_TOKEN_BUDGET - budget)
+        conversation.extend(turns[i] for i in sorted(turns))
+        return conversation
+
+
+chat_history_index = ChatHistoryIndex(
+    max_batch_size=CHAT_INDEX_BATCH_SIZE,
+    max_wait_s=CHAT_INDEX_BATCH_WAIT_S,
+)
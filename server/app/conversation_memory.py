@@ -0,0 +1,190 @@
+import asyncio
+import os
+import queue
+import threading
+from typing import List, Optional
+
+from app.utils import metrics
+from app.utils.extract_text import count_tokens
+from app.utils.supabase_client import get_async_supabase, supabase
+from app.utils.text_processing import build_conversation_history, compact_summary, summary_or_excerpt
+
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "20"))
+MEMORY_SUMMARY_TOKEN_BUDGET = int(os.getenv("MEMORY_SUMMARY_TOKEN_BUDGET", "600"))
+
+ROLES = {"user": "user", "ai": "assistant"}
+
+
+class ConversationMemory:
+    """
+    Per-user chat memory kept in the `conversation_memory` table.
+
+    Each stored message is appended with one RPC: the last `recent_messages`
+    turns are kept verbatim and older ones are folded into a rolling summary
+    as short excerpts. Building history is then a single-row read. A user's
+    first append seeds the row from their earlier messages. Excerpts start as
+    the first words of a message and are replaced by its LLM summary once the
+    summary queue has one. When the summary grows past `summary_token_budget`
+    tokens a background thread condenses it with one LLM call.
+    """
+
+    def __init__(self, recent_messages: int = 20, summary_token_budget: int = 600):
+        self.recent_messages = max(2, recent_messages)
+        self.summary_token_budget = summary_token_budget
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.compactions = metrics.counter("memory_compactions")
+        self.failures = metrics.counter("memory_compaction_failures")
+
+    # ── writes ────────────────────────────────────────────────────────────
+    @staticmethod
+    def _excerpt(row: dict) -> str:
+        prefix = "AI" if row["sender"] == "ai" else "User"
+        return f"{prefix}: {summary_or_excerpt(row)}"
+
+    def _rpc_params(self, row: dict) -> dict:
+        return {
+            "p_user_id": row["user_id"],
+            "p_turn": {
+                "id": row["id"],
+                "role": ROLES.get(row["sender"], "user"),
+                "content": row["message"],
+                "excerpt": self._excerpt(row),
+            },
+            "p_keep": self.recent_messages,
+        }
+
+    def append(self, row: dict):
+        """`row` is a chat_messages row as returned by the insert."""
+        try:
+            resp = supabase.rpc("append_conversation_memory", self._rpc_params(row)).execute()
+            self._maybe_compact(resp.data)
+        except Exception as e:
+            # History falls back to rebuilding from chat_messages
+            print(f"⚠️ Failed to update conversation memory: {e}")
+
+    async def aappend(self, row: dict):
+        try:
+            client = await get_async_supabase()
+            resp = await client.rpc("append_conversation_memory", self._rpc_params(row)).execute()
+            self._maybe_compact(resp.data)
+        except Exception as e:
+            print(f"⚠️ Failed to update conversation memory: {e}")
+
+    def update_excerpts(self, rows: List[dict]):
+        """`rows` are chat_messages rows whose `summary` was just filled in."""
+        turns = [
+            {"user_id": row["user_id"], "id": row["id"], "excerpt": self._excerpt(row)}
+            for row in rows if row.get("summary")
+        ]
+        if not turns:
+            return
+        try:
+            supabase.rpc("set_conversation_memory_excerpts", {"p_turns": turns}).execute()
+        except Exception as e:
+            # The turns keep their first-words excerpt
+            print(f"⚠️ Failed to update conversation memory excerpts: {e}")
+
+    # ── reads ─────────────────────────────────────────────────────────────
+    def load(self, user_id: int) -> Optional[dict]:
+        resp = supabase.table("conversation_memory")\
+            .select("summary, recent")\
+            .eq("user_id", user_id)\
+            .limit(1)\
+            .execute()
+        return resp.data[0] if resp.data else None
+
+    async def aload(self, user_id: int) -> Optional[dict]:
+        client = await get_async_supabase()
+        resp = await client.table("conversation_memory")\
+            .select("summary, recent")\
+            .eq("user_id", user_id)\
+            .limit(1)\
+            .execute()
+        return resp.data[0] if resp.data else None
+
+    def history(self, user_id: int) -> List[dict]:
+        mem = self.load(user_id)
+        if mem is None:
+            return build_conversation_history(user_id)
+        return self.conversation(mem)
+
+    async def ahistory(self, user_id: int) -> List[dict]:
+        mem = await self.aload(user_id)
+        if mem is None:
+            # only users without a memory row yet; the rebuild is sync
+            return await asyncio.to_thread(build_conversation_history, user_id)
+        return self.conversation(mem)
+
+    @staticmethod
+    def conversation(mem: dict) -> List[dict]:
+        conversation = []
+        if mem["summary"]:
+            conversation.append({
+                "role": "system",
+                "content": f"Summary of earlier conversation:\n{mem['summary']}"
+            })
+        conversation.extend({"role": t["role"], "content": t["content"]} for t in mem["recent"])
+        return conversation
+
+    # ── background compaction ─────────────────────────────────────────────
+    def _maybe_compact(self, mem: Optional[dict]):
+        if not mem or count_tokens(mem.get("summary") or "") <= self.summary_token_budget:
+            return
+        user_id = mem["user_id"]
+        with self._pending_lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self._ensure_worker()
+        self._queue.put(user_id)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="memory-compaction", daemon=True)
+                self._worker.start()
+
+    def _compact(self, user_id: int):
+        resp = supabase.table("conversation_memory")\
+            .select("summary, version")\
+            .eq("user_id", user_id)\
+            .limit(1)\
+            .execute()
+        if not resp.data:
+            return
+        mem = resp.data[0]
+        if count_tokens(mem["summary"]) <= self.summary_token_budget:
+            return
+
+        condensed = compact_summary(mem["summary"], self.summary_token_budget)
+        # Only replace the summary nobody appended to meanwhile; the next
+        # append re-triggers compaction otherwise
+        supabase.table("conversation_memory")\
+            .update({"summary": condensed})\
+            .eq("user_id", user_id)\
+            .eq("version", mem["version"])\
+            .execute()
+        self.compactions.inc()
+
+    def _run(self):
+        while True:
+            user_id = self._queue.get()
+            with self._pending_lock:
+                self._pending.discard(user_id)
+            try:
+                self._compact(user_id)
+            except Exception as e:
+                self.failures.inc()
+                print(f"⚠️ Failed to compact conversation memory for user {user_id}: {e}")
+
+
+conversation_memory = ConversationMemory(
+    recent_messages=MEMORY_RECENT_MESSAGES,
+    summary_token_budget=MEMORY_SUMMARY_TOKEN_BUDGET,
+)
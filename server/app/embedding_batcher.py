@@ -0,0 +1,119 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from app.utils import metrics
+
+
+class _Pending:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-query embedding requests into batched encodes.
+
+    Callers block on `embed_one`/`embed` (or await `aembed_one`); a background
+    thread waits up to `max_wait_ms` after the first queued text (or until
+    `max_batch_size` texts are queued), runs one `encode_fn` call for the whole
+    batch and hands each caller its own vector back.
+
+    Attributes:
+        encode_fn (Callable): Batched encoder, List[str] -> List[List[float]].
+        max_batch_size (int): Upper bound on texts per encode call.
+        max_wait_ms (float): How long the first text in a batch may wait for company.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self.batch_sizes = metrics.histogram(
+            "embedding_batch_size", [1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = metrics.histogram(
+            "embedding_queue_wait_ms", [0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        pending = _Pending(text)
+        self._queue.put(pending)
+        return pending.future
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        futures = [self.submit(t) for t in texts]
+        return [f.result() for f in futures]
+
+    async def aembed_one(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> List[_Pending]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Drain whatever is already queued even once the deadline passed
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Never let one batch take the worker down; later callers would hang
+                print(f"⚠️ Embedding batch failed: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _process(self, batch: List[_Pending]):
+        # Drop callers that gave up (a cancelled aembed_one cancels its future);
+        # the rest can no longer be cancelled, so setting their result is safe
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for pending in batch:
+            self.queue_wait_ms.observe((started - pending.enqueued_at) * 1000)
+
+        try:
+            vectors = self.encode_fn([p.text for p in batch])
+        except Exception as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        for pending, vector in zip(batch, vectors):
+            pending.future.set_result(vector)
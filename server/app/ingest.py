@@ -0,0 +1,12 @@
+"""
+python -m app.ingest  → re-sync the index with ./docs
+
+Kept apart from app.rag on purpose: the parse workers are spawned, and a
+spawned process re-imports the __main__ module, so running app.rag itself
+would load the embedding model and API clients once per worker.
+"""
+
+if __name__ == "__main__":
+    from app.rag import upsert_documents
+
+    upsert_documents()
@@ -1,12 +1,27 @@
+import multiprocessing
 import os
-from typing import List
-import pdfplumber
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
+from app.utils.pdf_extract import extract_pages
+
 from nltk.tokenize import sent_tokenize
 import nltk
 
-nltk.download('punkt')
+# Parse workers start with "spawn", not fork: setup_rag can run an ingest inside
+# the server, which has live threads (embedding batcher, queues, HTTP clients)
+# that a forked child would inherit mid-operation. Spawned workers re-import
+# this module, so it must stay cheap to import.
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+@lru_cache(maxsize=None)
+def ensure_punkt():
+    # once per process, on first use rather than at import
+    nltk.download('punkt')
 
 class Document:
     def __init__(self, page_content: str, metadata: dict = None):
@@ -18,13 +33,11 @@ def load_txt_file(file_path: str) -> str:
         return f.read()
 
 def load_pdf_file(file_path: str) -> str:
-    text = ""
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    return text
+    # Ingest already parses files in a process pool, so no nested pool here
+    return "\n".join(extract_pages(file_path, parallel=False))
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
+    ensure_punkt()
     sentences = sent_tokenize(text)
     chunks = []
     current_chunk = ""
@@ -47,27 +60,71 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str
 
     return final_chunks
 
+SUPPORTED_EXTENSIONS = {".txt", ".pdf"}
+
+def iter_document_files(path="./docs") -> Iterator[str]:
+    for root, _, files in os.walk(path):
+        for file in sorted(files):
+            if Path(file).suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.join(root, file)
+
+def load_file(file_path: str) -> str:
+    ext = Path(file_path).suffix.lower()
+    if ext == ".txt":
+        return load_txt_file(file_path)
+    if ext == ".pdf":
+        return load_pdf_file(file_path)
+    raise ValueError(f"Unsupported file type: {ext}")
+
+def split_file(file_path: str) -> List[Document]:
+    if Path(file_path).suffix.lower() == ".pdf":
+        # Chunk page by page so every chunk knows where it came from
+        return [
+            Document(page_content=chunk, metadata={"source": file_path, "page": page_number})
+            for page_number, page_text in enumerate(extract_pages(file_path, parallel=False), start=1)
+            for chunk in chunk_text(page_text)
+        ]
+    chunks = chunk_text(load_file(file_path))
+    return [Document(page_content=chunk, metadata={"source": file_path}) for chunk in chunks]
+
+def _split_file_safe(file_path: str) -> Tuple[str, List[Document], Optional[str]]:
+    # Runs in a worker process; errors are returned as text since not every
+    # parser exception pickles cleanly
+    try:
+        return file_path, split_file(file_path), None
+    except Exception as e:
+        return file_path, [], str(e)
+
+def iter_split_files(file_paths: Iterable[str], max_workers: int = None) -> Iterator[Tuple[str, List[Document], Optional[str]]]:
+    """
+    Parse and chunk files across a process pool, yielding (path, chunks, error)
+    in input order. Only 2 * max_workers files are in flight at once, so memory
+    is bounded by that window rather than by the size of the corpus.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    paths = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+        in_flight = deque(pool.submit(_split_file_safe, p) for p in islice(paths, 2 * max_workers))
+        while in_flight:
+            result = in_flight.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                in_flight.append(pool.submit(_split_file_safe, next_path))
+            yield result
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
 def load_and_split_documents(path="./docs") -> List[Document]:
     documents = []
 
-    for root, _, files in os.walk(path):
-        for file in files:
-            ext = Path(file).suffix.lower()
-            full_path = os.path.join(root, file)
-
-            try:
-                if ext == ".txt":
-                    content = load_txt_file(full_path)
-                elif ext == ".pdf":
-                    content = load_pdf_file(full_path)
-                else:
-                    continue
-
-                chunks = chunk_text(content)
-                for chunk in chunks:
-                    documents.append(Document(page_content=chunk, metadata={"source": full_path}))
-            except Exception as e:
-                print(f"⚠️ Failed to load {full_path}: {e}")
+    for full_path in iter_document_files(path):
+        try:
+            documents.extend(split_file(full_path))
+        except Exception as e:
+            print(f"⚠️ Failed to load {full_path}: {e}")
 
     print(f"✅ Loaded {len(documents)} chunks.")
     return documents
@@ -3,7 +3,7 @@ from pydantic import BaseModel
 
 
 class ChatSendRequest(BaseModel):
-            firebase_token: str
+            firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
             message: str
     
 class SourceDocument(BaseModel):
@@ -17,9 +17,6 @@ class ChatSendResponse(BaseModel):
     sources: List[SourceDocument]
 
 
-class ChatGetRequest(BaseModel):
-    firebase_token: str
-
 class ChatMessage(BaseModel):
     id: Optional[int] = None
     user_id: int
@@ -32,4 +29,31 @@ class ChatMessage2(BaseModel):
     created_at: str
 
 class ChatGetResponse(BaseModel):
-    messages: List[ChatMessage2]
\ No newline at end of file
+    messages: List[ChatMessage2]      # oldest first within the page
+    has_more: bool = False            # more messages beyond this page, in the direction fetched
+    before_cursor: Optional[int] = None   # pass as ?before= for older messages
+    after_cursor: Optional[int] = None    # pass as ?after= for newer messages
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], limit: int, before: Optional[int] = None,
+                  after: Optional[int] = None) -> "ChatGetResponse":
+        # `rows` is up to limit + 1 rows in scan order: ascending id when paging
+        # with `after`, descending otherwise. The extra row only signals has_more.
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows = rows[::-1]
+        return cls(
+            messages=[
+                ChatMessage2(
+                    id=m["id"],
+                    sender=m["sender"],
+                    message=m["message"],
+                    created_at=m["created_at"]
+                )
+                for m in rows
+            ],
+            has_more=has_more,
+            before_cursor=rows[0]["id"] if rows else before,
+            after_cursor=rows[-1]["id"] if rows else after,
+        )
@@ -1,6 +1,7 @@
+from typing import Optional
 from pydantic import BaseModel
 
 
 class AskRequest(BaseModel):
     q: str
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
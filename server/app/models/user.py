@@ -18,5 +18,5 @@ class AuthUser(BaseModel):
     created_at: Optional[datetime.datetime] = None
 
 class AuthLoginRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # may come from the Authorization header instead
     email: Optional[str] = None  # 👈 Allows email to be null
\ No newline at end of file
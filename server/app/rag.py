@@ -1,13 +1,20 @@
+import json
 import os
-from typing import Tuple, List
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, ScoredPoint
-from openai import OpenAI
-
-from app.utils.text_processing import clean_text
-from .load_documents import load_and_split_documents
-from uuid import uuid4
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, Tuple, List
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from openai import AsyncOpenAI, OpenAI
+
+from app.embedding_batcher import EmbeddingBatcher
+from app.semantic_cache import SemanticAnswerCache
+from app.utils.cache import LRUTTLCache
+from app.utils.pdf_extract import file_sha256
+from app.utils.text_processing import StreamCleaner, clean_text
+from app.vector_store import LocalVectorStore, QdrantVectorStore
+from .load_documents import batched, iter_document_files, iter_split_files
+from uuid import NAMESPACE_URL, uuid5
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,17 +24,70 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_COLLECTION_NAME = "pcos"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client
+# "qdrant" (remote collection) or "local" (in-process memory-mapped NumPy index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./index/pcos")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+
+DOCS_DIR = os.getenv("DOCS_DIR", "./docs")
+# Maps each ingested file to its content hash and the point IDs of its chunks
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", f"./index/{VECTOR_BACKEND}_manifest.json")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or None  # None → os.cpu_count()
+
+# Query-time embedding micro-batching
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+# Query embedding / retrieval result caches
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "3600"))
+
+# Opt-in semantic answer cache, e.g. SEMANTIC_CACHE_MODES=chat. "upload" answers
+# are personalised to a lab report and are never cached.
+SEMANTIC_CACHE_MODES = {
+    m.strip() for m in os.getenv("SEMANTIC_CACHE_MODES", "").split(",") if m.strip()
+} - {"upload"}
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_TTL_S = float(os.getenv("SEMANTIC_CACHE_TTL_S", "3600"))
+
+# Initialize OpenAI clients (sync for the threadpool handlers, async for async def ones)
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+# Embedding model, loaded on first use: importing this module (the server, or a
+# process that re-imports it) should not pay for torch and the model weights
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
 
-# Initialize embedding model
-embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+                _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
 
-# Initialize Qdrant client
+# Initialize Qdrant clients
 qdrant = QdrantClient(
     url=QDRANT_URL,
     api_key=QDRANT_API_KEY,
 )
+async_qdrant = AsyncQdrantClient(
+    url=QDRANT_URL,
+    api_key=QDRANT_API_KEY,
+)
+
+# Initialize the vector store selected by VECTOR_BACKEND
+if VECTOR_BACKEND == "local":
+    vector_store = LocalVectorStore(LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE)
+elif VECTOR_BACKEND == "qdrant":
+    vector_store = QdrantVectorStore(qdrant, QDRANT_COLLECTION_NAME, async_client=async_qdrant)
+else:
+    raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
 
 # ✅ Lightweight Document class
 class Document:
@@ -36,43 +96,220 @@ class Document:
         self.metadata = metadata or {}
 
 def embed(texts: List[str]) -> List[List[float]]:
-    return embedding_model.encode(texts, convert_to_tensor=False).tolist()
+    return get_embedding_model().encode(texts, convert_to_tensor=False).tolist()
+
+# Shared by every query-time caller, so concurrent requests share one forward pass
+embedding_batcher = EmbeddingBatcher(
+    embed,
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+)
+
+def chunk_point_id(source: str, chunk_index: int, content_hash: str) -> str:
+    # Deterministic, so re-ingesting an unchanged file maps onto the same points
+    return str(uuid5(NAMESPACE_URL, f"{source}:{chunk_index}:{content_hash}"))
+
+def load_manifest() -> Dict[str, dict]:
+    if not os.path.exists(INGEST_MANIFEST_PATH):
+        return {}
+    with open(INGEST_MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-def upsert_documents():
+def save_manifest(manifest: Dict[str, dict]):
+    os.makedirs(os.path.dirname(INGEST_MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = INGEST_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, INGEST_MANIFEST_PATH)
+
+class IngestStats:
+    """Counts and time spent per ingest stage, for throughput reporting."""
+
+    def __init__(self):
+        self.files = 0
+        self.chunks = 0
+        self.vectors = 0
+        self.seconds = {"parse": 0.0, "embed": 0.0, "upsert": 0.0}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def report(self) -> str:
+        def rate(count, seconds):
+            return count / seconds if seconds > 0 else 0.0
+        wall = time.perf_counter() - self.started
+        return (
+            f"parse {rate(self.files, self.seconds['parse']):.1f} files/s, "
+            f"embed {rate(self.chunks, self.seconds['embed']):.1f} chunks/s, "
+            f"upsert {rate(self.vectors, self.seconds['upsert']):.1f} vectors/s "
+            f"({self.files} files, {self.vectors} vectors in {wall:.1f}s)"
+        )
+
+def upsert_documents(path: str = DOCS_DIR):
+    """
+    Incrementally sync the vector store with the files under `path`.
+
+    Only new or changed files (by SHA-256 of their content) are re-ingested.
+    They are parsed in a process pool and their chunks stream through fixed-size
+    embedding batches, each upserted as soon as it is ready, so peak memory does
+    not grow with the corpus. Points belonging to removed or superseded files
+    are deleted afterwards, so the index is never empty mid-ingest.
+
+    An index built before the manifest existed has points nothing tracks;
+    the first sync re-ingests every file and then deletes every point it did
+    not write.
+    """
     print("📄 Loading and indexing documents...")
-    documents = load_and_split_documents()
-    texts = [doc.page_content for doc in documents]
-    vectors = embed(texts)
-
-    payloads = [{"text": doc.page_content, "metadata": doc.metadata} for doc in documents]
-    points = [
-        PointStruct(id=str(uuid4()), vector=vec, payload=payload)
-        for vec, payload in zip(vectors, payloads)
-    ]
-
-    qdrant.recreate_collection(
-        collection_name=QDRANT_COLLECTION_NAME,
-        vectors_config={"size": len(vectors[0]), "distance": "Cosine"},
+    # A manifest without its index (e.g. a fresh collection) describes nothing
+    index_exists = vector_store.exists()
+    untracked_index = index_exists and not os.path.exists(INGEST_MANIFEST_PATH)
+    manifest = load_manifest() if index_exists else {}
+    current = {file_path: file_sha256(file_path) for file_path in iter_document_files(path)}
+
+    removed = [p for p in manifest if p not in current]
+    changed = [p for p, h in current.items() if manifest.get(p, {}).get("hash") != h]
+    if not removed and not changed:
+        print("✅ Index is up to date.")
+        return
+
+    stale_ids = []
+    for file_path in removed:
+        stale_ids.extend(manifest.pop(file_path)["chunk_ids"])
+
+    stats = IngestStats()
+
+    def iter_chunks() -> Iterator[Tuple[str, Document]]:
+        parsed = iter_split_files(changed, max_workers=INGEST_WORKERS)
+        while True:
+            with stats.stage("parse"):
+                item = next(parsed, None)
+            if item is None:
+                return
+            file_path, documents, error = item
+            if error:
+                # Keep whatever was indexed for this file before
+                print(f"⚠️ Failed to load {file_path}: {error}")
+                continue
+
+            content_hash = current[file_path]
+            ids = [chunk_point_id(file_path, i, content_hash) for i in range(len(documents))]
+            if file_path in manifest:
+                stale_ids.extend(manifest[file_path]["chunk_ids"])
+            manifest[file_path] = {"hash": content_hash, "chunk_ids": ids}
+            stats.files += 1
+            yield from zip(ids, documents)
+
+    vector_store.create(get_embedding_model().get_sentence_embedding_dimension())
+    for batch in batched(iter_chunks(), INGEST_BATCH_SIZE):
+        ids = [pid for pid, _ in batch]
+        texts = [doc.page_content for _, doc in batch]
+        payloads = [{"text": doc.page_content, "metadata": doc.metadata} for _, doc in batch]
+
+        with stats.stage("embed"):
+            vectors = embed(texts)
+        stats.chunks += len(batch)
+        with stats.stage("upsert"):
+            vector_store.upsert(ids, vectors, payloads)
+        stats.vectors += len(vectors)
+
+    if untracked_index:
+        tracked = {pid for entry in manifest.values() for pid in entry["chunk_ids"]}
+        untracked = [pid for pid in vector_store.point_ids() if pid not in tracked]
+        print(f"🧹 Removing {len(untracked)} points indexed before the manifest existed")
+        stale_ids.extend(untracked)
+
+    vector_store.delete(stale_ids)
+    vector_store.commit()
+    save_manifest(manifest)
+    invalidate_retrieval_cache()
+    print(f"✅ Indexing completed ({len(changed)} changed, {len(removed)} removed): {stats.report()}")
+
+# normalized query → query vector
+query_embedding_cache = LRUTTLCache("query_embedding", maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_S)
+# (normalized query, top_k) → [(point_id, score, payload), ...]
+retrieval_cache = LRUTTLCache("retrieval", maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_S)
+# query meaning + retrieved chunk set → (answer, docs)
+answer_cache = SemanticAnswerCache(
+    maxsize=SEMANTIC_CACHE_SIZE,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL_S,
+)
+_cached_index_version = None
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+def index_version():
+    # The manifest is rewritten on every ingest that changes the index, including
+    # ingests run from another process (python -m app.ingest)
+    try:
+        return os.stat(INGEST_MANIFEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def invalidate_retrieval_cache():
+    global _cached_index_version
+    # the local index is memory-mapped; pick up files another process committed
+    vector_store.reload()
+    retrieval_cache.clear()
+    answer_cache.clear()
+    _cached_index_version = index_version()
+
+def embed_query(query: str) -> List[float]:
+    # Embed the normalized text the vector is cached under, so every spelling
+    # that maps to the key gets the same vector whether or not it hits
+    key = normalize_query(query)
+    query_vec = query_embedding_cache.get(key)
+    if query_vec is None:
+        query_vec = embedding_batcher.embed_one(key)
+        query_embedding_cache.set(key, query_vec)
+    return query_vec
+
+async def aembed_query(query: str) -> List[float]:
+    key = normalize_query(query)
+    query_vec = query_embedding_cache.get(key)
+    if query_vec is None:
+        query_vec = await embedding_batcher.aembed_one(key)
+        query_embedding_cache.set(key, query_vec)
+    return query_vec
+
+def retrieve(query: str, top_k: int = 5):
+    if index_version() != _cached_index_version:
+        invalidate_retrieval_cache()
+
+    key = (normalize_query(query), top_k)
+    hits = retrieval_cache.get(key)
+    if hits is None:
+        hits = vector_store.search(embed_query(query), top_k)
+        retrieval_cache.set(key, hits)
+    return hits
+
+async def aretrieve(query: str, top_k: int = 5):
+    if index_version() != _cached_index_version:
+        invalidate_retrieval_cache()
+
+    key = (normalize_query(query), top_k)
+    hits = retrieval_cache.get(key)
+    if hits is None:
+        hits = await vector_store.asearch(await aembed_query(query), top_k)
+        retrieval_cache.set(key, hits)
+    return hits
+
+def hit_to_document(payload: dict) -> Document:
+    return Document(
+        page_content=payload.get("text", ""),
+        metadata=payload.get("metadata", {})
     )
-    qdrant.upsert(collection_name=QDRANT_COLLECTION_NAME, points=points)
-    print("✅ Indexing completed.")
 
 def search_similar_docs(query: str, top_k=5) -> List[Tuple[float, Document]]:
-    query_vec = embed([query])[0]
-    results: List[ScoredPoint] = qdrant.search(
-        collection_name=QDRANT_COLLECTION_NAME,
-        query_vector=query_vec,
-        limit=top_k,
-        with_payload=True,
-        with_vectors=False,
-    )
-    return [
-        (hit.score, Document(
-            page_content=hit.payload.get("text", ""),
-            metadata=hit.payload.get("metadata", {})
-        ))
-        for hit in results
-    ]
+    results = retrieve(query, top_k)
+    return [(score, hit_to_document(payload)) for _, score, payload in results]
 
 def generate_prompt(context: str, question: str, mode: str = "chat") -> str:
     if mode == "upload":
@@ -112,24 +349,51 @@ def generate_prompt(context: str, question: str, mode: str = "chat") -> str:
 
         Answer:""".strip()
 
-def setup_rag():
-    collections = [col.name for col in qdrant.get_collections().collections]
-    if QDRANT_COLLECTION_NAME not in collections:
-        upsert_documents()
+class RagChain:
+    """
+    Retrieval-augmented answering over the PCOS corpus.
 
-    def rag_chain_fn(query: str, mode: str = "chat", history: List[dict] = None) -> Tuple[str, List[Document]]:
-        results = search_similar_docs(query)
+    Calling the chain returns `(answer, docs)` once generation has finished;
+    `acall` does the same with async clients for `async def` handlers, and
+    `stream` yields the retrieved docs first and then the answer as it is
+    generated, for callers that care about time-to-first-token; `astream` is
+    its async counterpart.
+    """
 
+    def _prepare(self, query: str, mode: str, history: List[dict] = None, cacheable: bool = None):
+        hits = retrieve(query)
+        cache_key = None
+        if mode in SEMANTIC_CACHE_MODES and self._cacheable(history, cacheable):
+            cache_key = (embed_query(query), [pid for pid, _, _ in hits])
+        return self._build_messages(query, mode, history, hits, cache_key)
 
-        
-        docs = [doc for _, doc in results]
-        context = "\n\n".join(doc.page_content for doc in docs)
+    async def _aprepare(self, query: str, mode: str, history: List[dict] = None, cacheable: bool = None):
+        hits = await aretrieve(query)
+        cache_key = None
+        if mode in SEMANTIC_CACHE_MODES and self._cacheable(history, cacheable):
+            cache_key = (await aembed_query(query), [pid for pid, _, _ in hits])
+        return self._build_messages(query, mode, history, hits, cache_key)
 
+    @staticmethod
+    def _cacheable(history: List[dict], cacheable: bool) -> bool:
+        return not history if cacheable is None else cacheable
+
+    def _build_messages(self, query: str, mode: str, history: List[dict], hits, cache_key):
+        docs = [hit_to_document(payload) for _, _, payload in hits]
+        context = "\n\n".join(doc.page_content for doc in docs)
         prompt = generate_prompt(context, query, mode=mode)
 
         # Construct chat history
         messages = history[:] if history else []
         messages.append({"role": "user", "content": prompt})
+        return docs, messages, cache_key
+
+    def __call__(self, query: str, mode: str = "chat", history: List[dict] = None, cacheable: bool = None) -> Tuple[str, List[Document]]:
+        docs, messages, cache_key = self._prepare(query, mode, history, cacheable)
+        if cache_key is not None:
+            cached = answer_cache.lookup(*cache_key)
+            if cached is not None:
+                return cached
 
         response = openai_client.chat.completions.create(
             model="gpt-4.1-nano",
@@ -138,6 +402,113 @@ def setup_rag():
         )
         raw_answer = response.choices[0].message.content
         answer = clean_text(raw_answer)
+        if cache_key is not None:
+            answer_cache.store(*cache_key, answer, docs)
+        return answer, docs
+
+    async def acall(self, query: str, mode: str = "chat", history: List[dict] = None, cacheable: bool = None) -> Tuple[str, List[Document]]:
+        docs, messages, cache_key = await self._aprepare(query, mode, history, cacheable)
+        if cache_key is not None:
+            cached = answer_cache.lookup(*cache_key)
+            if cached is not None:
+                return cached
+
+        response = await async_openai_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=messages,
+            temperature=0.3,
+        )
+        raw_answer = response.choices[0].message.content
+        answer = clean_text(raw_answer)
+        if cache_key is not None:
+            answer_cache.store(*cache_key, answer, docs)
         return answer, docs
 
-    return rag_chain_fn
\ No newline at end of file
+    def stream(self, query: str, mode: str = "chat", history: List[dict] = None, cacheable: bool = None) -> Iterator[Tuple[str, object]]:
+        """
+        Yields ("sources", docs), then ("token", text) as the answer is
+        generated, cleaned on the fly (`StreamCleaner` holds back a trailing
+        partial sequence until the next delta settles it), and finally
+        ("done", answer) with `clean_text` over the whole answer, which matches
+        what `__call__` returns and is what gets cached and stored.
+        """
+        docs, messages, cache_key = self._prepare(query, mode, history, cacheable)
+        yield "sources", docs
+
+        if cache_key is not None:
+            cached = answer_cache.lookup(*cache_key)
+            if cached is not None:
+                yield "token", cached[0]
+                yield "done", cached[0]
+                return
+
+        response = openai_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+        )
+        parts = []
+        cleaner = StreamCleaner()
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            text = cleaner.feed(delta)
+            if text:
+                yield "token", text
+        text = cleaner.flush()
+        if text:
+            yield "token", text
+
+        answer = clean_text("".join(parts))
+        if cache_key is not None:
+            answer_cache.store(*cache_key, answer, docs)
+        yield "done", answer
+
+    async def astream(self, query: str, mode: str = "chat", history: List[dict] = None, cacheable: bool = None) -> AsyncIterator[Tuple[str, object]]:
+        """`stream` with the async embedding, Qdrant and OpenAI clients."""
+        docs, messages, cache_key = await self._aprepare(query, mode, history, cacheable)
+        yield "sources", docs
+
+        if cache_key is not None:
+            cached = answer_cache.lookup(*cache_key)
+            if cached is not None:
+                yield "token", cached[0]
+                yield "done", cached[0]
+                return
+
+        response = await async_openai_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+        )
+        parts = []
+        cleaner = StreamCleaner()
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            text = cleaner.feed(delta)
+            if text:
+                yield "token", text
+        text = cleaner.flush()
+        if text:
+            yield "token", text
+
+        answer = clean_text("".join(parts))
+        if cache_key is not None:
+            answer_cache.store(*cache_key, answer, docs)
+        yield "done", answer
+
+def setup_rag() -> RagChain:
+    if not vector_store.exists():
+        upsert_documents()
+    return RagChain()
@@ -0,0 +1,278 @@
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.utils import metrics
+from app.utils.supabase_client import SUPABASE_URL, supabase
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_DOWNLOAD_TIMEOUT_S = float(os.getenv("REPORT_DOWNLOAD_TIMEOUT_S", "30"))
+REPORT_MAX_BYTES = int(os.getenv("REPORT_MAX_BYTES", str(25 * 1024 * 1024)))
+REPORT_MAX_REDIRECTS = int(os.getenv("REPORT_MAX_REDIRECTS", "3"))
+# Reports are only fetched from our own Supabase storage; extra hosts are comma-separated
+REPORT_DOWNLOAD_HOSTS = {
+    host.strip().lower()
+    for host in [urlparse(SUPABASE_URL).hostname or "", *os.getenv("REPORT_DOWNLOAD_HOSTS", "").split(",")]
+    if host.strip()
+}
+REPORT_JOB_TTL_S = float(os.getenv("REPORT_JOB_TTL_S", "3600"))
+# Share the extraction step (never the advice) across users for identical files
+REPORT_EXTRACTION_CACHE = os.getenv("REPORT_EXTRACTION_CACHE", "0").lower() in ("1", "true", "yes")
+
+STAGE_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+
+def check_report_url(url: str):
+    """Raises ValueError unless `url` is an https URL on an allowed storage host."""
+    parsed = urlparse(url)
+    if parsed.scheme != "https" or (parsed.hostname or "").lower() not in REPORT_DOWNLOAD_HOSTS:
+        raise ValueError("Report URL must point to Supabase storage")
+
+
+class ReportJobQueue:
+    """
+    In-process queue that runs `HealthReportAgent` off the request path.
+
+    `submit` records a job and returns its id immediately. A fixed pool of
+    worker threads downloads the report from its URL, runs the agent and
+    writes the result to `medical_reports.rag_output`. Job state lives in
+    memory for REPORT_JOB_TTL_S after it finishes; jobs still queued when the
+    process exits are lost and keep `rag_output.status = "queued"`.
+
+    The file is hashed while it downloads. If the same user already has an
+    analysed report with that hash, its `rag_output` is reused and the agent
+    does not run. With REPORT_EXTRACTION_CACHE on, extracted values are also
+    shared across users via `report_extractions`; advice is always generated
+    per report.
+
+    Attributes:
+        agent (HealthReportAgent): Agent used for every job.
+        workers (int): Number of worker threads.
+    """
+
+    def __init__(self, agent, workers: int = 2):
+        self.agent = agent
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._threads = []
+
+        self.completed = metrics.counter("report_jobs_completed")
+        self.failed = metrics.counter("report_jobs_failed")
+        self.reused = metrics.counter("report_jobs_reused")
+        self.extraction_hits = metrics.counter("report_extraction_cache_hits")
+        metrics.gauge("report_queue_depth", self._queue.qsize)
+        metrics.gauge("report_workers_busy", lambda: self._busy)
+        metrics.gauge("report_workers", lambda: self.workers)
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"report-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, report_id: int, user_id: int, file_url: str, file_name: str) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "report_id": report_id,
+                "user_id": user_id,
+                "file_url": file_url,
+                "file_name": file_name,
+                "status": "queued",
+                "stage": None,
+                "timings_ms": {},
+                "error": None,
+                "submitted_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "_finished": None,
+            }
+        self._start()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            out = {k: v for k, v in job.items() if not k.startswith("_") and k != "file_url"}
+            out["timings_ms"] = dict(job["timings_ms"])
+        if out["status"] == "queued":
+            out["queue_depth"] = self._queue.qsize()
+        return out
+
+    def _prune(self):
+        # Called with the lock held; forgets finished jobs after REPORT_JOB_TTL_S
+        now = time.monotonic()
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["_finished"] and now - job["_finished"] > REPORT_JOB_TTL_S]:
+            del self._jobs[job_id]
+
+    def _set(self, job: dict, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _download(self, url: str, file_name: str) -> Tuple[str, str]:
+        """
+        Streams the file to a temp path, hashing it on the way. Returns (path, sha256).
+
+        Every hop must pass `check_report_url`; redirects are followed by hand
+        (at most REPORT_MAX_REDIRECTS) so one cannot lead off the storage host,
+        and the download stops once it exceeds REPORT_MAX_BYTES.
+        """
+        suffix = os.path.splitext(file_name)[1] or os.path.splitext(urlparse(url).path)[1]
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for _ in range(REPORT_MAX_REDIRECTS + 1):
+                    check_report_url(url)
+                    with httpx.stream("GET", url, timeout=REPORT_DOWNLOAD_TIMEOUT_S, follow_redirects=False) as resp:
+                        if resp.is_redirect:
+                            url = str(resp.url.join(resp.headers["location"]))
+                            continue
+                        resp.raise_for_status()
+                        if int(resp.headers.get("content-length") or 0) > REPORT_MAX_BYTES:
+                            raise ValueError(f"Report is larger than {REPORT_MAX_BYTES} bytes")
+                        size = 0
+                        for chunk in resp.iter_bytes():
+                            size += len(chunk)
+                            if size > REPORT_MAX_BYTES:
+                                raise ValueError(f"Report is larger than {REPORT_MAX_BYTES} bytes")
+                            digest.update(chunk)
+                            f.write(chunk)
+                        break
+                else:
+                    raise ValueError("Too many redirects")
+        except Exception:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest()
+
+    def _find_analysed(self, job: dict, content_hash: str) -> Optional[dict]:
+        resp = supabase.table("medical_reports")\
+            .select("id, rag_output")\
+            .eq("user_id", job["user_id"])\
+            .eq("content_hash", content_hash)\
+            .eq("rag_output->>status", "done")\
+            .neq("id", job["report_id"])\
+            .order("created_at", desc=True)\
+            .limit(1)\
+            .execute()
+        return resp.data[0] if resp.data else None
+
+    def _cached_extraction(self, content_hash: str) -> Optional[dict]:
+        resp = supabase.table("report_extractions")\
+            .select("extraction")\
+            .eq("content_hash", content_hash)\
+            .limit(1)\
+            .execute()
+        return resp.data[0]["extraction"] if resp.data else None
+
+    def _save(self, job: dict, content_hash: str, rag_output: dict):
+        self._set(job, stage="save")
+        start = time.perf_counter()
+        supabase.table("medical_reports").update({
+            "content_hash": content_hash,
+            "rag_output": {**rag_output, "status": "done", "job_id": job["job_id"]},
+        }).eq("id", job["report_id"]).execute()
+        job["timings_ms"]["save"] = (time.perf_counter() - start) * 1000
+
+    def _process(self, job: dict):
+        timings = job["timings_ms"]
+
+        self._set(job, status="running", stage="download")
+        start = time.perf_counter()
+        path, content_hash = self._download(job["file_url"], job["file_name"])
+        timings["download"] = (time.perf_counter() - start) * 1000
+
+        try:
+            # 1) same user, same bytes, already analysed → reuse it
+            self._set(job, stage="dedup")
+            start = time.perf_counter()
+            previous = self._find_analysed(job, content_hash)
+            extraction = None
+            if previous is None and REPORT_EXTRACTION_CACHE:
+                extraction = self._cached_extraction(content_hash)
+            timings["dedup"] = (time.perf_counter() - start) * 1000
+
+            if previous is not None:
+                self.reused.inc()
+                self._set(job, reused_from=previous["id"])
+                output = {k: v for k, v in previous["rag_output"].items() if k not in ("status", "job_id")}
+                self._save(job, content_hash, {**output, "reused_from": previous["id"]})
+                return
+            if extraction is not None:
+                self.extraction_hits.inc()
+
+            # 2) the agent fills in its own stages (parse, extract, advise) as it goes
+            def on_stage(stage: str):
+                self._set(job, stage=stage)
+
+            result = self.agent.run(
+                path, timings=timings, on_stage=on_stage,
+                digest=content_hash, extraction=extraction,
+            )
+        finally:
+            os.remove(path)
+
+        if "error" in result:
+            raise RuntimeError(f"{result['error']} {result.get('details', '')}".strip())
+
+        if REPORT_EXTRACTION_CACHE and extraction is None:
+            try:
+                supabase.table("report_extractions").upsert({
+                    "content_hash": content_hash,
+                    "extraction": {"json_data": result["json_data"], "parse_stats": result.get("parse_stats")},
+                }, on_conflict="content_hash", ignore_duplicates=True).execute()
+            except Exception as e:
+                print(f"⚠️ Could not cache extraction for {content_hash[:12]}: {e}")
+
+        self._save(job, content_hash, result)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                self._busy += 1
+            try:
+                self._process(job)
+                self._set(job, status="done", stage=None)
+                self.completed.inc()
+            except Exception as e:
+                self.failed.inc()
+                print(f"❌ Report job {job_id} failed: {e}")
+                self._set(job, status="failed", error=str(e))
+                try:
+                    supabase.table("medical_reports").update({
+                        "rag_output": {"status": "failed", "job_id": job_id, "error": str(e)},
+                    }).eq("id", job["report_id"]).execute()
+                except Exception as save_error:
+                    print(f"⚠️ Could not record failure for report {job['report_id']}: {save_error}")
+            finally:
+                for stage, ms in job["timings_ms"].items():
+                    metrics.histogram(f"report_stage_{stage}_ms", STAGE_BUCKETS_MS).observe(ms)
+                with self._lock:
+                    self._busy -= 1
+                    job["finished_at"] = datetime.utcnow().isoformat()
+                    job["_finished"] = time.monotonic()
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import etag_json_response
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="/body-data", tags=["body_data"])
@@ -10,12 +12,8 @@ router = APIRouter(prefix="/body-data", tags=["body_data"])
 # Request Models
 # ----------------------------
 
-class GetBodyDataRequest(BaseModel):
-    firebase_token: str
-
-
 class UpdateBodyDataRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     age: int
     height_cm: float
     weight_kg: float
@@ -24,51 +22,43 @@ class UpdateBodyDataRequest(BaseModel):
 
 
 # ----------------------------
-# Routes
+# Queries
 # ----------------------------
 
-@router.post("/get")
-def get_body_data(req: GetBodyDataRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
-    user_id = user["id"]
-
-    # First try to get the record without forcing .single()
-    response = supabase.table("body_data_user").select("*").eq("user_id", user_id).limit(1).execute()
+def fetch_body_data(user_id: int) -> dict:
+    # One round trip: returns the row, inserting the zeroed default on first access
+    # (see sql/single_row_upserts.sql)
+    response = supabase.rpc("get_or_create_body_data", {"p_user_id": user_id}).execute()
 
-    # If no record exists, insert default
     if not response.data:
-        supabase.table("body_data_user").insert({
-            "user_id": user_id,
-            "age": 0,
-            "height_cm": 0,
-            "weight_kg": 0,
-            "waist_in": 0,
-            "bmi": 0
-        }).execute()
+        raise HTTPException(status_code=500, detail="Could not load body data.")
+
+    return response.data[0]
 
-        # Fetch again
-        response = supabase.table("body_data_user").select("*").eq("user_id", user_id).limit(1).execute()
 
-    return {"body_data": response.data[0]}
+# ----------------------------
+# Routes
+# ----------------------------
+
+@router.api_route("/get", methods=["GET", "POST"])
+def get_body_data(request: Request, user: dict = Depends(get_current_user)):
+    return etag_json_response(request, {"body_data": fetch_body_data(user["id"])})
 
 @router.post("/update")
-def update_body_data(req: UpdateBodyDataRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def update_body_data(req: UpdateBodyDataRequest, user: dict = Depends(get_current_user)):
     user_id = user["id"]
 
-    # Update all values
-    update_response = supabase.table("body_data_user").update({
+    # Upsert all values and get the row back in the same round trip
+    response = supabase.table("body_data_user").upsert({
+        "user_id": user_id,
         "age": req.age,
         "height_cm": req.height_cm,
         "weight_kg": req.weight_kg,
         "waist_in": req.waist_in,
         "bmi": req.bmi
-    }).eq("user_id", user_id).execute()
-
-    # Return updated record
-    updated_data = supabase.table("body_data_user").select("*").eq("user_id", user_id).single().execute()
+    }, on_conflict="user_id").execute()
 
-    if updated_data.data is None:
+    if not response.data:
         raise HTTPException(status_code=500, detail="Update failed.")
 
-    return {"body_data": updated_data.data}
\ No newline at end of file
+    return {"body_data": response.data[0]}
\ No newline at end of file
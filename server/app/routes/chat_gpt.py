@@ -1,20 +1,28 @@
+import asyncio
+import os
 import re
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 
 import openai
 
 from app.models.chat import (
     ChatSendRequest,
-    ChatGetRequest,
     ChatSendResponse,
     ChatGetResponse,
-    ChatMessage2,
     SourceDocument,
 )
-from app.utils.firebase import verify_firebase_and_get_user
-from app.utils.supabase_client import supabase
-from app.utils.text_processing import build_conversation_history, summarize_individual_message
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import etag_json_response
+from app.utils.sse import sse_event
+from app.utils.supabase_client import get_async_supabase, supabase
+from app.chat_history_index import chat_history_index
+from app.conversation_memory import conversation_memory
+from app.summary_queue import summary_queue
+
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+CHAT_PAGE_MAX = int(os.getenv("CHAT_PAGE_MAX", "100"))
 
 # ── Patterns that signal “remember our prior chat” ────────────────────────────
 _HISTORY_TRIGGERS = [
@@ -35,89 +43,178 @@ def needs_history(message: str) -> bool:
     return any(re.search(pat, text) for pat in _HISTORY_TRIGGERS)
 
 
+# Messages are stored with a pending (NULL) summary; summary_queue fills it in later.
+# Each stored message is also appended to the user's rolling conversation memory
+# and queued for embedding into their chat history index.
+async def astore_message(user_id: int, sender: str, message: str):
+    client = await get_async_supabase()
+    resp = await client.table("chat_messages").insert({
+        "user_id": user_id,
+        "sender": sender,
+        "message": message,
+    }).execute()
+    if resp.data:
+        summary_queue.enqueue(resp.data[0])
+        chat_history_index.enqueue(resp.data[0])
+        await conversation_memory.aappend(resp.data[0])
+
+
+async def ahistory_for(user_id: int, message: str) -> Tuple[List[dict], bool]:
+    """
+    The history to answer `message` with, and whether the answer may go to
+    the shared semantic cache. Only the fixed default prompt is cacheable; a
+    recalled history is per-user even when it is a lone summary message.
+    """
+    # Only build history if user explicitly asks to “remember”
+    if needs_history(message):
+        print("User asked to remember prior chat.")
+        return await chat_history_index.ahistory(user_id, message), False
+    print("User did not ask to remember prior chat.")
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful AI assistant focused on PCOS & women's health."
+        }
+    ], True
+
+
+def fetch_messages(
+    user_id: int,
+    limit: int = CHAT_PAGE_SIZE,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+) -> ChatGetResponse:
+    """
+    One page of chat history, keyset-paginated on `id`.
+
+    Without cursors this is the newest page. `before` pages back to older
+    messages and `after` forward to newer ones. Each page is a single indexed
+    range scan on (user_id, id), so cost does not grow with history length.
+    """
+    limit = max(1, min(limit, CHAT_PAGE_MAX))
+
+    query = (
+        supabase.table("chat_messages")
+        .select("id, sender, message, created_at")
+        .eq("user_id", user_id)
+    )
+    if after is not None:
+        query = query.gt("id", after).order("id", desc=False)
+    else:
+        if before is not None:
+            query = query.lt("id", before)
+        query = query.order("id", desc=True)
+
+    # one extra row tells us whether another page exists
+    rows = query.limit(limit + 1).execute().data or []
+    return ChatGetResponse.from_rows(rows, limit, before=before, after=after)
+
+
+def format_sources(docs) -> List[SourceDocument]:
+    sources, seen = [], set()
+    for d in docs:
+        m = d.metadata
+        key = (m.get("source"), m.get("page"))
+        if key in seen:
+            continue
+        seen.add(key)
+        sources.append(SourceDocument(
+            page=str(m.get("page", "N/A")),
+            title=m.get("title", "Untitled"),
+            source=m.get("source", "Unknown"),
+            snippet=d.page_content[:300].strip()
+        ))
+    return sources
+
+
 # ── Factory to create a router bound to your RAG chain ────────────────────────
 def create_gpt_router(rag_chain) -> APIRouter:
     router = APIRouter(tags=["chat_interaction"])
 
     @router.post("/chat-send-message", response_model=ChatSendResponse)
-    def chat_send(req: ChatSendRequest):
-        user = verify_firebase_and_get_user(req.firebase_token)
+    async def chat_send(req: ChatSendRequest, background_tasks: BackgroundTasks,
+                        user: dict = Depends(get_current_user)):
         user_id = user["id"]
 
-        # 1) Summarize & store the incoming user message
-        usr_sum = summarize_individual_message(req.message)
-        supabase.table("chat_messages").insert({
-            "user_id": user_id,
-            "sender": "user",
-            "message": req.message,
-            "summary": usr_sum
-        }).execute()
+        # 1) Store the incoming user message while we retrieve/answer
+        store_user_msg = asyncio.create_task(astore_message(user_id, "user", req.message))
 
         # 2) Only build history if user explicitly asks to “remember”
-        if needs_history(req.message):
-            print("User asked to remember prior chat.")
-            history = build_conversation_history(user_id)
-        else:
-            print("User did not ask to remember prior chat.")
-            history = [
-                {
-                    "role": "system",
-                    "content": "You are a helpful AI assistant focused on PCOS & women's health."
-                }
-            ]
+        history, cacheable = await ahistory_for(user_id, req.message)
 
         # 3) Invoke your RAG chain with that history
         try:
-            answer, docs = rag_chain(req.message, history=history)
+            answer, docs = await rag_chain.acall(req.message, history=history, cacheable=cacheable)
         except Exception as e:
+            # Let the store finish, but a failure there must not mask the RAG error
+            try:
+                await store_user_msg
+            except Exception as store_error:
+                print(f"⚠️ Failed to store user message: {store_error}")
             raise HTTPException(status_code=500, detail=f"RAG chain error: {e}")
 
-        # 4) Summarize & store AI reply
-        ai_sum = summarize_individual_message(answer)
-        supabase.table("chat_messages").insert({
-            "user_id": user_id,
-            "sender": "ai",
-            "message": answer.strip(),
-            "summary": ai_sum
-        }).execute()
+        # Keep the user message ahead of the AI reply in chat_messages
+        await store_user_msg
+
+        # 4) Store AI reply after the response has been sent
+        background_tasks.add_task(astore_message, user_id, "ai", answer.strip())
 
         # 5) Format any source documents
-        sources, seen = [], set()
-        for d in docs:
-            m = d.metadata
-            key = (m.get("source"), m.get("page"))
-            if key in seen:
-                continue
-            seen.add(key)
-            sources.append(SourceDocument(
-                page=str(m.get("page", "N/A")),
-                title=m.get("title", "Untitled"),
-                source=m.get("source", "Unknown"),
-                snippet=d.page_content[:300].strip()
-            ))
-
-        return ChatSendResponse(reply=answer.strip(), sources=sources)
-
-    @router.post("/chat-get-message", response_model=ChatGetResponse)
-    def chat_get(req: ChatGetRequest):
-        user = verify_firebase_and_get_user(req.firebase_token)
-        resp = (
-            supabase.table("chat_messages")
-            .select("*")
-            .eq("user_id", user["id"])
-            .order("id", desc=False)
-            .limit(20)
-            .execute()
-        )
-        msgs = [
-            ChatMessage2(
-                id=m["id"],
-                sender=m["sender"],
-                message=m["message"],
-                created_at=m["created_at"]
-            )
-            for m in (resp.data or [])
-        ]
-        return ChatGetResponse(messages=msgs)
+        return ChatSendResponse(reply=answer.strip(), sources=format_sources(docs))
+
+    @router.post("/chat-send-message/stream")
+    async def chat_send_stream(req: ChatSendRequest, user: dict = Depends(get_current_user)):
+        """
+        Server-Sent Events variant of /chat-send-message: a `sources` event,
+        then `token` events cleaned as the answer is generated, then `done`
+        with the full reply once it has been stored in chat_messages; clients
+        should display that in place of the concatenated tokens. The user
+        message is stored while retrieval and generation run.
+        """
+        user_id = user["id"]
+
+        store_user_msg = asyncio.create_task(astore_message(user_id, "user", req.message))
+        history, cacheable = await ahistory_for(user_id, req.message)
+
+        async def event_stream():
+            answer = ""
+            try:
+                async for kind, value in rag_chain.astream(req.message, history=history, cacheable=cacheable):
+                    if kind == "sources":
+                        yield sse_event("sources", [s.model_dump() for s in format_sources(value)])
+                    elif kind == "token":
+                        yield sse_event("token", {"text": value})
+                    else:
+                        answer = value
+            except Exception as e:
+                try:
+                    await store_user_msg
+                except Exception as store_error:
+                    print(f"⚠️ Failed to store user message: {store_error}")
+                yield sse_event("error", {"detail": f"RAG chain error: {e}"})
+                return
+
+            try:
+                # Keep the user message ahead of the AI reply in chat_messages
+                await store_user_msg
+                await astore_message(user_id, "ai", answer.strip())
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Failed to store message: {e}"})
+                return
+            yield sse_event("done", {"reply": answer.strip()})
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @router.api_route("/chat-get-message", methods=["GET", "POST"], response_model=ChatGetResponse)
+    def chat_get(
+        request: Request,
+        limit: int = Query(CHAT_PAGE_SIZE, ge=1),
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        user: dict = Depends(get_current_user),
+    ):
+        if before is not None and after is not None:
+            raise HTTPException(status_code=400, detail="Use either before or after, not both")
+        return etag_json_response(request, fetch_messages(user["id"], limit, before, after))
 
     return router
\ No newline at end of file
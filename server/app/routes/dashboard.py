@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from app.routes.body_data import fetch_body_data
+from app.routes.chat_gpt import fetch_messages
+from app.routes.diet import fetch_diets
+from app.routes.pcos_symptoms import fetch_pcos_symptoms
+from app.routes.period_calendar import fetch_periods
+from app.utils import metrics
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import etag_json_response
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+# How long one source may take before the dashboard is returned without it
+DASHBOARD_SOURCE_TIMEOUT_S = float(os.getenv("DASHBOARD_SOURCE_TIMEOUT_S", "2.0"))
+
+# key in the response → query helper of the owning route module
+SOURCES = {
+    "body_data":     fetch_body_data,
+    "pcos_symptoms": fetch_pcos_symptoms,
+    "diets":         fetch_diets,
+    "periods":       fetch_periods,
+    "chat":          fetch_messages,
+}
+
+source_ms = {
+    name: metrics.histogram(f"dashboard_{name}_ms", [10, 25, 50, 100, 250, 500, 1000, 2000])
+    for name in SOURCES
+}
+source_failures = metrics.counter("dashboard_source_failures")
+
+
+async def _load(name: str, user_id: int):
+    start = time.perf_counter()
+    try:
+        # the sync supabase client runs in the threadpool; on timeout the thread
+        # finishes in the background but we stop waiting for it
+        return await asyncio.wait_for(
+            run_in_threadpool(SOURCES[name], user_id),
+            timeout=DASHBOARD_SOURCE_TIMEOUT_S,
+        )
+    finally:
+        source_ms[name].observe((time.perf_counter() - start) * 1000)
+
+
+@router.api_route("", methods=["GET", "POST"])
+async def get_dashboard(request: Request, user: dict = Depends(get_current_user)):
+    """
+    Everything the home screen needs in one request.
+
+    All sources are queried concurrently. A source that fails or exceeds
+    DASHBOARD_SOURCE_TIMEOUT_S is returned as null and listed in `errors`,
+    so one slow table does not hold up the rest.
+    """
+    names = list(SOURCES)
+    results = await asyncio.gather(
+        *(_load(name, user["id"]) for name in names),
+        return_exceptions=True,
+    )
+
+    payload, errors = {}, {}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            source_failures.inc()
+            errors[name] = "timeout" if isinstance(result, asyncio.TimeoutError) else str(result)
+            print(f"⚠️ Dashboard source {name} failed: {errors[name]}")
+            payload[name] = None
+        else:
+            payload[name] = result
+    payload["errors"] = errors
+
+    # partial documents are not cacheable
+    if errors:
+        return JSONResponse(jsonable_encoder(payload), headers={"Cache-Control": "no-store"})
+    return etag_json_response(request, payload)
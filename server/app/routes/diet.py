@@ -1,33 +1,20 @@
-from typing import Dict, List
-from fastapi import APIRouter
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
 
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.catalog import catalog_cache
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import CATALOG_CACHE_CONTROL, etag_json_response
 from app.utils.supabase_client import supabase
 
 
 router = APIRouter(prefix="/diet", tags=["diet"])
 
-class DietChoice(BaseModel):
-    firebase_token: str
+def fetch_diets(user_id: int) -> list:
+    # 1) every diet option, from the in-memory catalog
+    all_diets = catalog_cache.get("diet_choices").rows  # e.g. ({"id":1, "name":"Keto"}, ...)
 
-@router.post("/get-diets")
-def get_diets(req: DietChoice):
-    # 1) verify Firebase token → get user ID
-    user = verify_firebase_and_get_user(req.firebase_token)
-    user_id = user["id"]
-
-    # 2) fetch every diet option
-    all_resp = (
-        supabase
-        .table("diet_choices")
-        .select("*")
-        .execute()
-    )
-
-    all_diets = all_resp.data  # e.g. [{"id":1, "name":"Keto"}, ...]
-
-    # 3) fetch only this user’s diet choices
+    # 2) fetch only this user’s diet choices
     user_resp = (
         supabase
         .table("diet_choices_user")
@@ -38,14 +25,15 @@ def get_diets(req: DietChoice):
     
     chosen_ids = {row["diet_id"] for row in user_resp.data}
 
-    # 4) annotate each diet with added: true/false
-    annotated = [
+    # 3) annotate each diet with added: true/false
+    return [
         { **diet, "added": diet["id"] in chosen_ids }
         for diet in all_diets
     ]
 
-    # 5) return the full list with flags
-    return {"diets": annotated}
+@router.api_route("/get-diets", methods=["GET", "POST"])
+def get_diets(request: Request, user: dict = Depends(get_current_user)):
+    return etag_json_response(request, {"diets": fetch_diets(user["id"])}, cache_control=CATALOG_CACHE_CONTROL)
 
 
 class DietPrefItem(BaseModel):
@@ -53,43 +41,39 @@ class DietPrefItem(BaseModel):
     added:   bool
 
 class UpdateDietRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     preferences:    List[DietPrefItem]
 
 
-@router.post("/update")
-def update_diets(req: UpdateDietRequest):
-    # 1. verify user
-    user = verify_firebase_and_get_user(req.firebase_token)
-    user_id = user["id"]
-
-    # 2. fetch current choices
-    current_resp = (
+def fetch_diet_ids(user_id: int) -> Set[int]:
+    resp = (
         supabase
         .table("diet_choices_user")
         .select("diet_id")
         .eq("user_id", user_id)
         .execute()
     )
-    
-    current_ids = {row["diet_id"] for row in current_resp.data}
+    return {row["diet_id"] for row in resp.data}
+
 
-    # 3. build a map from the incoming list
+def diff_diets(current_ids: Set[int], preferences: List[DietPrefItem]) -> Tuple[Set[int], Set[int], Set[int]]:
+    # The incoming list replaces the user's choices: anything not marked added is removed.
+    # Returns (desired_ids, to_add, to_remove).
     prefs_map: Dict[int, bool] = {
-        item.diet_id: item.added for item in req.preferences
+        item.diet_id: item.added for item in preferences
     }
     desired_ids = {did for did, added in prefs_map.items() if added}
+    return desired_ids, desired_ids - current_ids, current_ids - desired_ids
 
-    to_add    = desired_ids - current_ids
-    to_remove = current_ids - desired_ids
 
-    # 4. batch insert new choices
+def write_diet_changes(user_id: int, to_add: Set[int], to_remove: Set[int]):
+    # batch insert new choices
     if to_add:
         supabase.table("diet_choices_user") \
             .insert([{"user_id": user_id, "diet_id": did} for did in to_add]) \
             .execute()
 
-    # 5. batch delete removed choices
+    # batch delete removed choices
     if to_remove:
         supabase.table("diet_choices_user") \
             .delete() \
@@ -97,8 +81,23 @@ def update_diets(req: UpdateDietRequest):
             .in_("diet_id", list(to_remove)) \
             .execute()
 
+
+@router.post("/update")
+def update_diets(req: UpdateDietRequest, user: dict = Depends(get_current_user)):
+    # 1. user resolved once by the auth dependency
+    user_id = user["id"]
+
+    # 2. fetch current choices
+    current_ids = fetch_diet_ids(user_id)
+
+    # 3. diff against the incoming list
+    _, to_add, to_remove = diff_diets(current_ids, req.preferences)
+
+    # 4. one insert and one delete at most
+    write_diet_changes(user_id, to_add, to_remove)
+
     return {
         "status":  "success",
         "added":   list(to_add),
         "removed": list(to_remove),
-    }
\ No newline at end of file
+    }
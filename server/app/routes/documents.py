@@ -1,55 +1,32 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
 from openai import APIError
 from pydantic import BaseModel, HttpUrl
 from datetime import datetime
-from app.utils.firebase import verify_firebase_and_get_user
+from app.agents.health_report_agent import HealthReportAgent
+from app.report_jobs import REPORT_WORKERS, ReportJobQueue, check_report_url
+from app.utils.firebase import get_current_user
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 class UploadDocumentRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     image_url: HttpUrl
     file_name: str
 
-class GetDocumentsRequest(BaseModel):
-    firebase_token: str
-
 class EditDocumentNameRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None
     document_id: int
     new_filename: str
 
 class DeleteDocumentRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None
     document_id: int
 
-@router.post("/upload-document")
-async def upload_document(payload: UploadDocumentRequest):
-    user = verify_firebase_and_get_user(payload.firebase_token)
-    now = datetime.utcnow().isoformat()
-
-    insert = supabase.table("medical_reports").insert({
-        "user_id": user["id"],
-        "image_url": str(payload.image_url),
-        "filename": payload.file_name,
-        "rag_output": {"summary": "placeholder"},
-        "created_at": now
-    }).execute()
-
-    if insert.data is None:
-        raise HTTPException(500, "Error saving metadata")
-    return {
-        "message": "File metadata uploaded successfully",
-        "file_name": payload.file_name,
-        "file_url": payload.image_url
-    }
-
-@router.post("/get-documents")
-async def get_documents(req: GetDocumentsRequest):
-    # 1) Verify Firebase token → user record
-    user = verify_firebase_and_get_user(req.firebase_token)
+@router.api_route("/get-documents", methods=["GET", "POST"])
+async def get_documents(user: dict = Depends(get_current_user)):
+    # 1) user record resolved once by the auth dependency
 
     # 2) Attempt to fetch rows; execute() will raise APIError on bad status
     try:
@@ -74,8 +51,7 @@ async def get_documents(req: GetDocumentsRequest):
     return {"documents": nested}
 
 @router.post("/edit-document-name")
-async def edit_name(req: EditDocumentNameRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+async def edit_name(req: EditDocumentNameRequest, user: dict = Depends(get_current_user)):
     update = supabase.table("medical_reports").update({
         "filename": req.new_filename,
         "updated_at": datetime.utcnow().isoformat()
@@ -88,8 +64,7 @@ async def edit_name(req: EditDocumentNameRequest):
     return {"message": "Filename updated successfully"}
 
 @router.post("/delete-document")
-async def delete_document(req: DeleteDocumentRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+async def delete_document(req: DeleteDocumentRequest, user: dict = Depends(get_current_user)):
     delete = supabase.table("medical_reports")\
         .delete()\
         .eq("id", req.document_id)\
@@ -99,3 +74,52 @@ async def delete_document(req: DeleteDocumentRequest):
     if not count:
         raise HTTPException(404, "Document not found or no permission")
     return {"message": "Document deleted successfully"}
+
+
+# ── Factory: upload + analysis status, bound to your RAG chain ────────────────
+def create_documents_router(rag_chain) -> APIRouter:
+    jobs = ReportJobQueue(HealthReportAgent(rag_chain), workers=REPORT_WORKERS)
+
+    docs_router = APIRouter(tags=["documents"])
+    docs_router.include_router(router)
+
+    @docs_router.post("/documents/upload-document")
+    async def upload_document(payload: UploadDocumentRequest, user: dict = Depends(get_current_user)):
+        # The worker only downloads from our storage bucket
+        try:
+            check_report_url(str(payload.image_url))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        now = datetime.utcnow().isoformat()
+
+        insert = supabase.table("medical_reports").insert({
+            "user_id": user["id"],
+            "image_url": str(payload.image_url),
+            "filename": payload.file_name,
+            "rag_output": {"status": "queued"},
+            "created_at": now
+        }).execute()
+
+        if not insert.data:
+            raise HTTPException(500, "Error saving metadata")
+
+        # Analysis runs on the report workers; poll /documents/jobs/{job_id}
+        job_id = jobs.submit(insert.data[0]["id"], user["id"], str(payload.image_url), payload.file_name)
+
+        return {
+            "message": "File metadata uploaded successfully",
+            "file_name": payload.file_name,
+            "file_url": payload.image_url,
+            "document_id": insert.data[0]["id"],
+            "job_id": job_id,
+        }
+
+    @docs_router.get("/documents/jobs/{job_id}")
+    def get_job(job_id: str, user: dict = Depends(get_current_user)):
+        job = jobs.get(job_id)
+        if job is None or job["user_id"] != user["id"]:
+            raise HTTPException(404, "Job not found")
+        return job
+
+    return docs_router
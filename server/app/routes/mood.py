@@ -1,20 +1,20 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from app.utils.supabase_client import supabase
 
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.firebase import get_current_user
 
 
 router = APIRouter(prefix= "/mood",tags=["mood"])
 
 class MoodRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     mood: str
 
 @router.post("/log-mood")
-def log_mood(req: MoodRequest):
-    # 1) verify Firebase token → get user
-    user = verify_firebase_and_get_user(req.firebase_token)
+def log_mood(req: MoodRequest, user: dict = Depends(get_current_user)):
+    # 1) user resolved once by the auth dependency
 
     # 2) insert mood into database
     insert_response = (
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.catalog import catalog_cache
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import CATALOG_CACHE_CONTROL, etag_json_response
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="/pcos-symptoms", tags=["pcos_symptoms"])
@@ -10,38 +13,25 @@ router = APIRouter(prefix="/pcos-symptoms", tags=["pcos_symptoms"])
 
 
 class SymptomAddRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     symptom_id: int
 
 
-class MySymptomsRequest(BaseModel):
-    firebase_token: str
+def fetch_pcos_symptoms(user_id: int) -> dict:
+    # 1) every symptom, from the in-memory catalog
+    all_symptoms = catalog_cache.get("pcos_symptoms").rows  # { "id": ..., "name": ... }
 
-@router.post("/get-all")
-def get_all_symptoms(req: MySymptomsRequest):
-    # 1) verify Firebase token → get user
-    user = verify_firebase_and_get_user(req.firebase_token)
-
-    # 2) fetch every symptom
-    all_response = (
-        supabase
-        .table("pcos_symptoms")
-        .select("*")
-        .execute()
-    )
-    all_symptoms = all_response.data  # List of { "id": ..., "name": ... }
-
-    # 3) fetch only this user’s symptoms
+    # 2) fetch only this user’s symptoms
     user_response = (
         supabase
         .table("pcos_symptoms_user")
         .select("symptom_id, pcos_symptoms(name)")
-        .eq("user_id", user["id"])
+        .eq("user_id", user_id)
         .execute()
     )
     user_ids = {row["symptom_id"] for row in user_response.data}
 
-    # 4) annotate each symptom with `added: true/false`
+    # 3) annotate each symptom with `added: true/false`
     annotated = [
         {
             **symptom,
@@ -50,7 +40,7 @@ def get_all_symptoms(req: MySymptomsRequest):
         for symptom in all_symptoms
     ]
 
-    # 5) return annotated list plus the raw my_symptoms if you still need them
+    # 4) return annotated list plus the raw my_symptoms if you still need them
     my_symptoms = [
         {"id": row["symptom_id"], "name": row.get("pcos_symptoms", {}).get("name", "")}
         for row in user_response.data
@@ -61,18 +51,20 @@ def get_all_symptoms(req: MySymptomsRequest):
         "my_symptoms":   my_symptoms,
     }
 
+@router.api_route("/get-all", methods=["GET", "POST"])
+def get_all_symptoms(request: Request, user: dict = Depends(get_current_user)):
+    return etag_json_response(request, fetch_pcos_symptoms(user["id"]), cache_control=CATALOG_CACHE_CONTROL)
+
 @router.post("/add")
-def add_symptom(req: SymptomAddRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def add_symptom(req: SymptomAddRequest, user: dict = Depends(get_current_user)):
     supabase.table("pcos_symptoms_user").insert({"user_id": user["id"], "symptom_id": req.symptom_id}).execute()
     return {"message": "Symptom added successfully"}
 
 
 
-@router.post("/get-my-symptoms")
-def get_my_symptoms(req: MySymptomsRequest):
-    # 1) verify Firebase token → get your user record
-    user = verify_firebase_and_get_user(req.firebase_token)
+@router.api_route("/get-my-symptoms", methods=["GET", "POST"])
+def get_my_symptoms(user: dict = Depends(get_current_user)):
+    # 1) user resolved once by the auth dependency
 
     # 2) pull from pcos_symptoms_user, selecting the FK + related name
     response = (
@@ -92,8 +84,7 @@ def get_my_symptoms(req: MySymptomsRequest):
     return {"my_symptoms": my_symptoms}
 
 @router.post("/remove")
-def remove_symptom(req: SymptomAddRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def remove_symptom(req: SymptomAddRequest, user: dict = Depends(get_current_user)):
     supabase.table("pcos_symptoms_user").delete().eq("user_id", user["id"]).eq("symptom_id", req.symptom_id).execute()
     return {"message": "Symptom removed successfully"}
 
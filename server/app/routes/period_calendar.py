@@ -1,66 +1,39 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import date, datetime, timedelta
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.firebase import get_current_user
+from app.utils.http_cache import etag_json_response
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="/period-calendar", tags=["period_calendar"])
 
 class PeriodUpdateRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     month: int
     year: int
     period_dates: List[date]
 
-class PeriodGetRequest(BaseModel):
-    firebase_token: str
-
 @router.post("/update")
-def update_period_calendar(req: PeriodUpdateRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def update_period_calendar(req: PeriodUpdateRequest, user: dict = Depends(get_current_user)):
     if not req.period_dates:
         raise HTTPException(400, "No period dates provided")
 
-    start_iso = min(req.period_dates).isoformat()
-    end_iso   = max(req.period_dates).isoformat()
-
-    ms = date(req.year, req.month, 1)
-    nm = date(req.year + 1 if req.month==12 else req.year,
-              1 if req.month==12 else req.month+1, 1)
-    now = datetime.utcnow().isoformat()
-
-    existing = supabase.table("periods")\
-        .select("*")\
-        .eq("user_id", user["id"])\
-        .gte("start_date", ms.isoformat())\
-        .lt("start_date", nm.isoformat())\
-        .execute()
-
-    if existing.data:
-        pid = existing.data[0]["id"]
-        supabase.table("periods").update({
-            "start_date": start_iso,
-            "end_date":   end_iso,
-            "updated_at": now
-        }).eq("id", pid).execute()
-        return {"message": "Period updated", "period_id": pid}
-
-    ins = supabase.table("periods").insert({
-        "user_id":    user["id"],
-        "start_date": start_iso,
-        "end_date":   end_iso,
-        "created_at": now,
-        "updated_at": now
+    # one row per (user, month): insert or update in a single statement
+    resp = supabase.rpc("upsert_period", {
+        "p_user_id":      user["id"],
+        "p_period_month": date(req.year, req.month, 1).isoformat(),
+        "p_start_date":   min(req.period_dates).isoformat(),
+        "p_end_date":     max(req.period_dates).isoformat(),
     }).execute()
 
-    if ins.data:
-        return {"message": "Period created", "period_id": ins.data[0]["id"]}
+    if resp.data:
+        row = resp.data[0]
+        message = "Period created" if row["created"] else "Period updated"
+        return {"message": message, "period_id": row["id"]}
     raise HTTPException(500, "Failed to create period")
 
-@router.post("/get")
-def get_period_calendar(req: PeriodGetRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def fetch_periods(user_id: int) -> list:
     today = datetime.utcnow().date()
     first = today.replace(day=1)
     four_months_ago = first
@@ -69,31 +42,29 @@ def get_period_calendar(req: PeriodGetRequest):
 
     resp = supabase.table("periods")\
         .select("*")\
-        .eq("user_id", user["id"])\
+        .eq("user_id", user_id)\
         .gte("start_date", four_months_ago.isoformat())\
         .order("start_date", desc=True)\
         .execute()
+    return resp.data or []
 
-    return {"periods": resp.data or []}
+@router.api_route("/get", methods=["GET", "POST"])
+def get_period_calendar(request: Request, user: dict = Depends(get_current_user)):
+    return etag_json_response(request, {"periods": fetch_periods(user["id"])})
 
 @router.post("/reset")
 class PeriodResetRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     month: int
     year: int
 
 @router.post("/reset")
-def reset_period_calendar(req: PeriodResetRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
-    start_of_month = date(req.year, req.month, 1)
-    next_month = date(req.year + 1 if req.month==12 else req.year,
-                      1 if req.month==12 else req.month+1, 1)
-
+def reset_period_calendar(req: PeriodResetRequest, user: dict = Depends(get_current_user)):
+    # the same (user, month) key /update writes
     to_del = supabase.table("periods")\
         .select("id")\
         .eq("user_id", user["id"])\
-        .gte("start_date", start_of_month.isoformat())\
-        .lt("start_date", next_month.isoformat())\
+        .eq("period_month", date(req.year, req.month, 1).isoformat())\
         .execute()
 
     if not to_del.data:
@@ -1,60 +1,102 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 from datetime import datetime
-from app.utils.firebase import verify_firebase_and_get_user
+from postgrest.exceptions import APIError
+from app.utils.catalog import catalog_cache
+from app.utils.firebase import get_current_user
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="/period-symptoms", tags=["period_symptoms"])
 
 class PeriodSymptomsUpdateRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     period_id: int
     symptoms: Dict[str, bool]
     notes: Optional[str] = None
 
 class PeriodSymptomsGetRequest(BaseModel):
-    firebase_token: str
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
     period_id: int
 
-@router.post("/update")
-def update_period_symptoms(req: PeriodSymptomsUpdateRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
-    owner = supabase.table("periods").select("user_id").eq("id", req.period_id).limit(1).execute()
-    if not owner.data or owner.data[0]["user_id"] != user["id"]:
+def resolve_symptom_ids(names: List[str]) -> Dict[str, int]:
+    """
+    Map symptom names to ids in a constant number of round trips: the catalog
+    first, then one `in_` select and one bulk insert for whatever is missing.
+    """
+    known = catalog_cache.get("symptoms").by_name
+    ids = {n: known[n]["id"] for n in names if n in known}
+    missing = [n for n in names if n not in ids]
+    if not missing:
+        return ids
+
+    # the catalog may be stale, ask the database before inserting
+    found = supabase.table("symptoms").select("id, name").in_("name", missing).execute()
+    ids.update({row["name"]: row["id"] for row in found.data or []})
+    missing = [n for n in missing if n not in ids]
+    if missing:
+        new = supabase.table("symptoms").insert([{"name": n} for n in missing]).execute()
+        if len(new.data or []) != len(missing):
+            raise HTTPException(500, f"Failed to create symptoms {missing}")
+        ids.update({row["name"]: row["id"] for row in new.data})
+    catalog_cache.invalidate("symptoms")
+    return ids
+
+
+def replace_period_symptoms(user_id: int, period_id: int, names: List[str], notes: Optional[str] = None) -> int:
+    """
+    Replace the symptoms logged for a period and return how many were stored.
+
+    Runs as one Postgres transaction through the `replace_period_symptoms` RPC
+    (sql/replace_period_symptoms.sql). If that function is not deployed, falls
+    back to a fixed number of PostgREST calls regardless of len(names).
+    """
+    names = list(dict.fromkeys(names))
+    try:
+        resp = supabase.rpc("replace_period_symptoms", {
+            "p_user_id":   user_id,
+            "p_period_id": period_id,
+            "p_names":     names,
+            "p_notes":     notes,
+        }).execute()
+        if any(n not in catalog_cache.get("symptoms").by_name for n in names):
+            catalog_cache.invalidate("symptoms")
+        return resp.data or 0
+    except APIError as e:
+        if e.code == "P0002":
+            raise HTTPException(404, "Period not found")
+        if e.code != "PGRST202":  # anything but "function not found"
+            raise
+        print("⚠️ replace_period_symptoms RPC missing, using bulk statements")
+
+    owner = supabase.table("periods").select("user_id").eq("id", period_id).limit(1).execute()
+    if not owner.data or owner.data[0]["user_id"] != user_id:
         raise HTTPException(404, "Period not found")
 
-    if req.notes is not None:
+    if notes is not None:
         supabase.table("periods").update({
-            "notes":      req.notes,
+            "notes":      notes,
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", req.period_id).execute()
-
-    # clear existing
-    supabase.table("period_symptoms").delete().eq("period_id", req.period_id).execute()
-
-    to_insert = []
-    for name, sel in req.symptoms.items():
-        if not sel:
-            continue
-        s = supabase.table("symptoms").select("id").eq("name", name).execute()
-        if s.data:
-            sid = s.data[0]["id"]
-        else:
-            new = supabase.table("symptoms").insert({"name": name}).execute()
-            if not new.data:
-                raise HTTPException(500, f"Failed to create symptom '{name}'")
-            sid = new.data[0]["id"]
-        to_insert.append({"period_id": req.period_id, "symptom_id": sid, "severity": 1})
+        }).eq("id", period_id).execute()
+
+    ids = resolve_symptom_ids(names)
 
+    # clear existing, then one bulk insert
+    supabase.table("period_symptoms").delete().eq("period_id", period_id).execute()
+    to_insert = [{"period_id": period_id, "symptom_id": ids[n], "severity": 1} for n in names]
     if to_insert:
         supabase.table("period_symptoms").insert(to_insert).execute()
+    return len(to_insert)
 
-    return {"message": "Symptoms and notes updated", "inserted": len(to_insert)}
+
+@router.post("/update")
+def update_period_symptoms(req: PeriodSymptomsUpdateRequest, user: dict = Depends(get_current_user)):
+    names = [name for name, sel in req.symptoms.items() if sel]
+    inserted = replace_period_symptoms(user["id"], req.period_id, names, req.notes)
+    return {"message": "Symptoms and notes updated", "inserted": inserted}
 
 @router.post("/get")
-def get_period_symptoms(req: PeriodSymptomsGetRequest):
-    user = verify_firebase_and_get_user(req.firebase_token)
+def get_period_symptoms(req: PeriodSymptomsGetRequest, user: dict = Depends(get_current_user)):
     per = supabase.table("periods").select("*").eq("id", req.period_id).limit(1).execute()
     if not per.data:
         raise HTTPException(404, "Period not found")
@@ -68,10 +110,15 @@ def get_period_symptoms(req: PeriodSymptomsGetRequest):
 
     out = []
     if rows:
-        ids = [r["symptom_id"] for r in rows]
-        sy = supabase.table("symptoms").select("id","name").in_("id", ids).execute()
-        name_map = {item["id"]: item["name"] for item in sy.data or []}
+        by_id = dict(catalog_cache.get("symptoms").by_id)
+        missing = list({r["symptom_id"] for r in rows} - by_id.keys())
+        if missing:
+            # created since the catalog was loaded (e.g. by another instance)
+            found = supabase.table("symptoms").select("*").in_("id", missing).execute()
+            by_id.update({row["id"]: row for row in found.data or []})
+            catalog_cache.merge("symptoms", found.data or [])
         for r in rows:
-            out.append({"id": r["symptom_id"], "name": name_map.get(r["symptom_id"], "Unknown"), "severity": r["severity"]})
+            name = by_id[r["symptom_id"]]["name"] if r["symptom_id"] in by_id else "Unknown"
+            out.append({"id": r["symptom_id"], "name": name, "severity": r["severity"]})
 
     return {"period": period, "symptoms": out}
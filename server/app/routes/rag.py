@@ -1,33 +1,53 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Any, List, Dict
 from app.models.rag import AskRequest
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.firebase import get_current_user
+from app.utils.sse import sse_event
 
 router = APIRouter(tags=["rag"])
 
+def format_sources(docs) -> List[Dict[str, Any]]:
+    sources = []
+    seen = set()
+    for d in docs:
+        meta = d.metadata
+        key = (meta.get("source"), meta.get("page"))
+        if key in seen: continue
+        seen.add(key)
+        sources.append({
+            "page": meta.get("page", "N/A"),
+            "title": meta.get("title", "Online article"),
+            "source": meta.get("source", "Unknown"),
+            "snippet": d.page_content[:300].strip()
+        })
+    return sources
+
 def create_rag_router(rag_chain):
     r = APIRouter(prefix="/rag")
 
     @r.post("/ask")
-    def ask(req: AskRequest) -> Any:
-        user = verify_firebase_and_get_user(req.firebase_token)
+    def ask(req: AskRequest, user: dict = Depends(get_current_user)) -> Any:
         answer, docs = rag_chain(req.q)
+        return {"question": req.q, "answer": answer.strip(), "sources": format_sources(docs)}
+
+    @r.post("/ask/stream")
+    def ask_stream(req: AskRequest, user: dict = Depends(get_current_user)):
+        # SSE: `sources`, then `token` events, then `done` with the full answer
+
+        def event_stream():
+            try:
+                for kind, value in rag_chain.stream(req.q):
+                    if kind == "sources":
+                        yield sse_event("sources", format_sources(value))
+                    elif kind == "token":
+                        yield sse_event("token", {"text": value})
+                    else:
+                        yield sse_event("done", {"question": req.q, "answer": value.strip()})
+            except Exception as e:
+                yield sse_event("error", {"detail": f"RAG chain error: {e}"})
 
-        sources = []
-        seen = set()
-        for d in docs:
-            meta = d.metadata
-            key = (meta.get("source"), meta.get("page"))
-            if key in seen: continue
-            seen.add(key)
-            sources.append({
-                "page": meta.get("page", "N/A"),
-                "title": meta.get("title", "Online article"),
-                "source": meta.get("source", "Unknown"),
-                "snippet": d.page_content[:300].strip()
-            })
-
-        return {"question": req.q, "answer": answer.strip(), "sources": sources}
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
 
     @r.get("/inspect")
     def inspect(q: str):
@@ -7,11 +7,14 @@ from app.routes.rag import create_rag_router
 from app.routes.period_calendar import router as period_calendar_router
 from app.routes.period_symptoms import router as period_symptoms_router
 from app.routes.chat_gpt import create_gpt_router
-from app.routes.documents import router as documents_router
+from app.routes.documents import create_documents_router
 from app.routes.pcos_symptoms import router as pcos_symptoms_router
 from app.routes.diet import router as diet_router
 from app.routes.mood import router as mood_router
 from app.routes.body_data import router as body_data_router
+from app.routes.metrics import router as metrics_router
+from app.routes.sync import router as sync_router
+from app.routes.dashboard import router as dashboard_router
 
 def create_router(rag_chain):
     router = APIRouter()
@@ -33,7 +36,7 @@ def create_router(rag_chain):
 
 
     # document upload/get/edit/delete
-    router.include_router(documents_router)
+    router.include_router(create_documents_router(rag_chain))
 
     router.include_router(pcos_symptoms_router)
 
@@ -43,4 +46,13 @@ def create_router(rag_chain):
 
     router.include_router(body_data_router)
 
+    # batched offline edits from the mobile app
+    router.include_router(sync_router)
+
+    # home screen: every read above in one request
+    router.include_router(dashboard_router)
+
+    # in-process metrics (embedding batches, caches, ...)
+    router.include_router(metrics_router)
+
     return router
@@ -0,0 +1,332 @@
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ValidationError
+
+from app.routes.diet import UpdateDietRequest, diff_diets, fetch_diet_ids, write_diet_changes
+from app.routes.mood import MoodRequest
+from app.routes.pcos_symptoms import SymptomAddRequest
+from app.routes.period_calendar import PeriodUpdateRequest
+from app.routes.period_symptoms import PeriodSymptomsUpdateRequest, resolve_symptom_ids
+from app.utils import metrics
+from app.utils.firebase import get_current_user
+from app.utils.supabase_client import supabase
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+SYNC_MAX_MUTATIONS = int(os.getenv("SYNC_MAX_MUTATIONS", "200"))
+
+sync_batch_size = metrics.histogram("sync_batch_size", [1, 2, 5, 10, 20, 50, 100, 200])
+
+
+# ----------------------------
+# Request / Response Models
+# ----------------------------
+
+MutationType = Literal[
+    "mood.log",
+    "pcos_symptoms.add",
+    "pcos_symptoms.remove",
+    "period_calendar.update",
+    "period_symptoms.update",
+    "diet.update",
+]
+
+# payload schema per mutation type, same bodies as the single-item endpoints
+PAYLOAD_MODELS = {
+    "mood.log":               MoodRequest,
+    "pcos_symptoms.add":      SymptomAddRequest,
+    "pcos_symptoms.remove":   SymptomAddRequest,
+    "period_calendar.update": PeriodUpdateRequest,
+    "period_symptoms.update": PeriodSymptomsUpdateRequest,
+    "diet.update":            UpdateDietRequest,
+}
+
+
+class Mutation(BaseModel):
+    idempotency_key: str  # generated by the client, unique per user
+    type: MutationType
+    payload: Dict[str, Any]
+
+
+class SyncRequest(BaseModel):
+    firebase_token: Optional[str] = None  # legacy; prefer the Authorization header
+    mutations: List[Mutation]
+
+
+class MutationResult(BaseModel):
+    idempotency_key: str
+    status: Literal["applied", "duplicate", "error"]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class SyncResponse(BaseModel):
+    results: List[MutationResult]
+
+
+# ----------------------------
+# Per-table bulk appliers
+# ----------------------------
+# Each takes the user id and the (key, payload) pairs of one group, in the
+# order the client sent them, and returns {key: result}. A group is applied
+# with a fixed number of statements; when two mutations touch the same row
+# the later one wins. A mutation that cannot be applied on its own gets a
+# MutationRejected as its result and the rest of the group still goes in.
+
+class MutationRejected(Exception):
+    pass
+
+
+def apply_moods(user_id: int, items: list) -> Dict[str, dict]:
+    supabase.table("moods").insert(
+        [{"user_id": user_id, "name": req.mood} for _, req in items]
+    ).execute()
+    return {key: {"mood": req.mood} for key, req in items}
+
+
+def apply_pcos_symptoms(user_id: int, items: list) -> Dict[str, dict]:
+    # fold add/remove toggles into the final state per symptom
+    final: Dict[int, bool] = {}
+    for _, (added, req) in items:
+        final[req.symptom_id] = added
+
+    to_add = [sid for sid, added in final.items() if added]
+    to_remove = [sid for sid, added in final.items() if not added]
+
+    if to_add:
+        supabase.table("pcos_symptoms_user").upsert(
+            [{"user_id": user_id, "symptom_id": sid} for sid in to_add],
+            on_conflict="symptom_id,user_id",
+            ignore_duplicates=True,
+        ).execute()
+    if to_remove:
+        supabase.table("pcos_symptoms_user").delete() \
+            .eq("user_id", user_id) \
+            .in_("symptom_id", to_remove) \
+            .execute()
+
+    return {key: {"symptom_id": req.symptom_id, "added": added} for key, (added, req) in items}
+
+
+def apply_diets(user_id: int, items: list) -> Dict[str, dict]:
+    # each diet.update replaces the choices like /diet/update does; replay them
+    # in memory for per-key results, then write only the net change
+    current = fetch_diet_ids(user_id)
+    state = current
+    out: Dict[str, dict] = {}
+    for key, req in items:
+        state, to_add, to_remove = diff_diets(state, req.preferences)
+        out[key] = {"added": sorted(to_add), "removed": sorted(to_remove)}
+
+    write_diet_changes(user_id, state - current, current - state)
+    return out
+
+
+def apply_period_calendar(user_id: int, items: list) -> Dict[str, dict]:
+    out: Dict[str, Any] = {}
+    now = datetime.utcnow().isoformat()
+    rows: Dict[str, dict] = {}
+    for key, req in items:
+        if not req.period_dates:
+            out[key] = MutationRejected("No period dates provided")
+            continue
+        month = date(req.year, req.month, 1).isoformat()
+        rows[month] = {
+            "user_id":      user_id,
+            "period_month": month,
+            "start_date":   min(req.period_dates).isoformat(),
+            "end_date":     max(req.period_dates).isoformat(),
+            "updated_at":   now,
+        }
+    if not rows:
+        return out
+
+    resp = supabase.table("periods").upsert(
+        list(rows.values()), on_conflict="user_id,period_month"
+    ).execute()
+    ids = {row["period_month"]: row["id"] for row in resp.data or []}
+
+    for key, req in items:
+        if key not in out:
+            out[key] = {"period_id": ids.get(date(req.year, req.month, 1).isoformat())}
+    return out
+
+
+def apply_period_symptoms(user_id: int, items: list) -> Dict[str, dict]:
+    owned = supabase.table("periods").select("id") \
+        .eq("user_id", user_id) \
+        .in_("id", list(dict.fromkeys(req.period_id for _, req in items))) \
+        .execute()
+    owned_ids = {row["id"] for row in owned.data or []}
+
+    out: Dict[str, Any] = {}
+    latest: Dict[int, PeriodSymptomsUpdateRequest] = {}
+    for key, req in items:
+        if req.period_id not in owned_ids:
+            out[key] = MutationRejected(f"Period not found: {req.period_id}")
+            continue
+        latest[req.period_id] = req
+    if not latest:
+        return out
+
+    now = datetime.utcnow().isoformat()
+    for period_id, req in latest.items():
+        if req.notes is not None:
+            supabase.table("periods").update({"notes": req.notes, "updated_at": now}) \
+                .eq("id", period_id).execute()
+
+    selected = {pid: [n for n, sel in req.symptoms.items() if sel] for pid, req in latest.items()}
+    ids = resolve_symptom_ids(list(dict.fromkeys(n for names in selected.values() for n in names)))
+
+    supabase.table("period_symptoms").delete().in_("period_id", list(latest)).execute()
+    to_insert = [
+        {"period_id": pid, "symptom_id": ids[n], "severity": 1}
+        for pid, names in selected.items()
+        for n in dict.fromkeys(names)
+    ]
+    if to_insert:
+        supabase.table("period_symptoms").insert(to_insert).execute()
+
+    for key, req in items:
+        if key not in out:
+            out[key] = {"period_id": req.period_id}
+    return out
+
+
+# table each mutation type writes to
+TABLE_FOR_TYPE = {
+    "mood.log":               "moods",
+    "pcos_symptoms.add":      "pcos_symptoms_user",
+    "pcos_symptoms.remove":   "pcos_symptoms_user",
+    "period_calendar.update": "periods",
+    "period_symptoms.update": "period_symptoms",
+    "diet.update":            "diet_choices_user",
+}
+
+# tables are applied in this order so a calendar write lands before symptom writes
+APPLIERS = {
+    "moods":              apply_moods,
+    "periods":            apply_period_calendar,
+    "period_symptoms":    apply_period_symptoms,
+    "pcos_symptoms_user": apply_pcos_symptoms,
+    "diet_choices_user":  apply_diets,
+}
+
+
+# ----------------------------
+# Routes
+# ----------------------------
+
+@router.post("", response_model=SyncResponse)
+def sync(req: SyncRequest, user: dict = Depends(get_current_user)):
+    """
+    Apply an ordered batch of offline edits for the current user.
+
+    Each idempotency key is claimed in `sync_mutations` before anything is
+    written, and only the mutations whose keys this request inserted are
+    applied, so a resend racing the original cannot apply them twice. Keys
+    that were already there are answered from the stored result. Applied
+    mutations get their result recorded; failed ones release their key so
+    they can be retried.
+    """
+    if len(req.mutations) > SYNC_MAX_MUTATIONS:
+        raise HTTPException(400, f"At most {SYNC_MAX_MUTATIONS} mutations per sync")
+    user_id = user["id"]
+    sync_batch_size.observe(len(req.mutations))
+
+    results: Dict[str, MutationResult] = {}
+
+    # 1) validate payloads, keeping the client's order; a key repeated inside
+    #    the batch is applied once
+    valid: Dict[str, tuple] = {}
+    for m in req.mutations:
+        if m.idempotency_key in results or m.idempotency_key in valid:
+            continue
+        try:
+            payload = PAYLOAD_MODELS[m.type].model_validate(m.payload)
+        except ValidationError as e:
+            results[m.idempotency_key] = MutationResult(
+                idempotency_key=m.idempotency_key, status="error", error=str(e)
+            )
+            continue
+        if m.type.startswith("pcos_symptoms."):
+            payload = (m.type == "pcos_symptoms.add", payload)
+        valid[m.idempotency_key] = (TABLE_FOR_TYPE[m.type], payload)
+
+    # 2) claim the keys: insert ... on conflict do nothing returning, so only
+    #    the rows this request inserted come back
+    claimed = set()
+    if valid:
+        resp = supabase.table("sync_mutations").upsert(
+            [{"user_id": user_id, "idempotency_key": key} for key in valid],
+            on_conflict="user_id,idempotency_key",
+            ignore_duplicates=True,
+        ).execute()
+        claimed = {row["idempotency_key"] for row in resp.data or []}
+
+    taken = [key for key in valid if key not in claimed]
+    if taken:
+        seen = supabase.table("sync_mutations").select("idempotency_key, result") \
+            .eq("user_id", user_id) \
+            .in_("idempotency_key", taken) \
+            .execute()
+        stored = {row["idempotency_key"]: row["result"] for row in seen.data or []}
+        for key in taken:
+            if stored.get(key) is not None:
+                results[key] = MutationResult(idempotency_key=key, status="duplicate", result=stored[key])
+            else:
+                # claimed by a request that is still applying it (or just gave it up)
+                results[key] = MutationResult(
+                    idempotency_key=key, status="error", error="Mutation is being applied by another request"
+                )
+
+    # 3) one bulk apply per table, for the claimed keys only
+    grouped: Dict[str, list] = {}
+    for key, (table, payload) in valid.items():
+        if key in claimed:
+            grouped.setdefault(table, []).append((key, payload))
+
+    applied: List[dict] = []
+    released: List[str] = []
+    for table, apply in APPLIERS.items():
+        items = grouped.get(table)
+        if not items:
+            continue
+        try:
+            out = apply(user_id, items)
+        except Exception as e:
+            print(f"❌ Sync failed for {table}: {e}")
+            for key, _ in items:
+                results[key] = MutationResult(idempotency_key=key, status="error", error=str(e))
+                released.append(key)
+            continue
+        for key, _ in items:
+            if isinstance(out[key], MutationRejected):
+                results[key] = MutationResult(idempotency_key=key, status="error", error=str(out[key]))
+                released.append(key)
+                continue
+            results[key] = MutationResult(idempotency_key=key, status="applied", result=out[key])
+            applied.append({"user_id": user_id, "idempotency_key": key, "result": out[key]})
+
+    # 4) record results on the claimed rows and release the failed keys
+    if applied:
+        try:
+            supabase.table("sync_mutations").upsert(
+                applied, on_conflict="user_id,idempotency_key"
+            ).execute()
+        except Exception as e:
+            # the keys stay claimed, so a resend is refused rather than re-applied
+            print(f"⚠️ Could not record sync results: {e}")
+    if released:
+        try:
+            supabase.table("sync_mutations").delete() \
+                .eq("user_id", user_id) \
+                .in_("idempotency_key", released) \
+                .execute()
+        except Exception as e:
+            print(f"⚠️ Could not release sync keys: {e}")
+
+    return SyncResponse(results=[results[m.idempotency_key] for m in req.mutations])
@@ -1,7 +1,7 @@
 import datetime
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.models.user import AuthLoginRequest, AuthUser, User
-from app.utils.firebase import verify_firebase_and_get_user
+from app.utils.firebase import get_current_user, get_firebase_token, invalidate_user, verify_firebase_token
 from app.utils.supabase_client import supabase
 
 router = APIRouter(prefix="", tags=["users"])
@@ -19,19 +19,12 @@ def get_users():
     return resp.data
 
 @router.post("/users/me", response_model=User)
-def get_current_user(auth_req: AuthLoginRequest):
-    return verify_firebase_and_get_user(auth_req.firebase_token)
+def get_me(user: dict = Depends(get_current_user)):
+    return user
 
 @router.post("/auth-login", response_model=AuthUser)
-def auth_login(auth_req: AuthLoginRequest):
-    from firebase_admin import auth
-    try:
-        decoded_token = auth.verify_id_token(auth_req.firebase_token)
-        uid = decoded_token.get("uid")
-        if not uid:
-            raise HTTPException(status_code=401, detail="Invalid Firebase token")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+def auth_login(auth_req: AuthLoginRequest, firebase_token: str = Depends(get_firebase_token)):
+    uid = verify_firebase_token(firebase_token)
 
     response = supabase.table("user_accounts").select("*").eq("uid", uid).execute()
     if response.data:
@@ -42,6 +35,7 @@ def auth_login(auth_req: AuthLoginRequest):
     insert_response = supabase.table("user_accounts").insert(user_data).execute()
     if insert_response.data is None:
         raise HTTPException(status_code=500, detail="Error inserting user")
+    invalidate_user(uid)
     return insert_response.data[0]
 
 @router.put("/{user_id}", response_model=User)
@@ -51,10 +45,16 @@ def update_user(user_id: int, user: User):
     check_response(resp)
     if not resp.data:
         raise HTTPException(404, "User not found")
+    # get_current_user caches rows by firebase uid
+    if resp.data[0].get("uid"):
+        invalidate_user(resp.data[0]["uid"])
     return resp.data[0]
 
 @router.delete("/{user_id}")
 def delete_user(user_id: int):
     resp = supabase.table("user").delete().eq("id", user_id).execute()
     check_response(resp)
+    for row in resp.data or []:
+        if row.get("uid"):
+            invalidate_user(row["uid"])
     return {"detail": "User deleted successfully"}
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.utils import metrics
+
+
+class _Entry:
+    __slots__ = ("vector", "chunk_key", "answer", "docs", "expires_at")
+
+    def __init__(self, vector, chunk_key, answer, docs, expires_at):
+        self.vector = vector
+        self.chunk_key = chunk_key
+        self.answer = answer
+        self.docs = docs
+        self.expires_at = expires_at
+
+
+class SemanticAnswerCache:
+    """
+    Caches RAG answers by query meaning rather than exact text.
+
+    A cached answer is reused when a new query's embedding is within
+    `threshold` cosine similarity of a previous query *and* retrieval returned
+    exactly the same set of chunks, so the LLM would have seen the same context.
+
+    Attributes:
+        maxsize (int): Maximum number of cached answers (LRU eviction).
+        threshold (float): Minimum cosine similarity for a hit.
+        ttl (float): Lifetime of a cached answer in seconds.
+    """
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95, ttl: float = 3600.0):
+        self.maxsize = max(1, maxsize)
+        self.threshold = threshold
+        self.ttl = ttl
+        self._ids = count()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_chunks: Dict[Tuple[str, ...], Set[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = metrics.counter("semantic_answer_cache_hits")
+        self.misses = metrics.counter("semantic_answer_cache_misses")
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        siblings = self._by_chunks[entry.chunk_key]
+        siblings.discard(entry_id)
+        if not siblings:
+            del self._by_chunks[entry.chunk_key]
+
+    def lookup(self, query_vec: List[float], chunk_ids: List[str]) -> Optional[tuple]:
+        chunk_key = tuple(sorted(chunk_ids))
+        query = self._unit(query_vec)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_chunks.get(chunk_key, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                score = float(entry.vector @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+        self.hits.inc()
+        return entry.answer, list(entry.docs)
+
+    def store(self, query_vec: List[float], chunk_ids: List[str], answer: str, docs: list):
+        chunk_key = tuple(sorted(chunk_ids))
+        entry = _Entry(self._unit(query_vec), chunk_key, answer, list(docs),
+                       time.monotonic() + self.ttl)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_chunks.setdefault(chunk_key, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+from typing import Dict, List
+
+from app.conversation_memory import conversation_memory
+from app.utils import metrics
+from app.utils.supabase_client import supabase
+from app.utils.text_processing import summarize_messages
+
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "20"))
+SUMMARY_BATCH_WAIT_S = float(os.getenv("SUMMARY_BATCH_WAIT_S", "2"))
+# Rows left pending by a failed batch or a restart are picked up by a sweep
+SUMMARY_SWEEP_INTERVAL_S = float(os.getenv("SUMMARY_SWEEP_INTERVAL_S", "300"))
+SUMMARY_SWEEP_MIN_AGE_S = float(os.getenv("SUMMARY_SWEEP_MIN_AGE_S", "120"))
+SUMMARY_MAX_ATTEMPTS = int(os.getenv("SUMMARY_MAX_ATTEMPTS", "3"))
+
+
+class SummaryQueue:
+    """
+    Fills in `chat_messages.summary` off the request path.
+
+    Messages are inserted with `summary = NULL` (pending) and their rows are
+    enqueued here. A background thread gathers up to `max_batch_size` rows
+    (waiting at most `max_wait_s` after the first), summarizes them with one
+    LLM call and writes all summaries back with one `set_chat_summaries` RPC,
+    which only fills rows that still exist and have no summary. The summaries
+    then replace the excerpts of those turns in conversation memory.
+
+    Every `sweep_interval_s` the worker also claims rows that are still
+    pending after `sweep_min_age_s` (a failed batch, or a restart that lost
+    the in-memory queue) with `claim_pending_summaries`, so replicas sweeping
+    at the same time never summarize the same row; a claim lapses after one
+    sweep interval. A row is given up on after `max_attempts` failed batches
+    in this process: its summary is set to '' and it is not swept again.
+    See sql/chat_message_summaries.sql.
+    """
+
+    def __init__(self, max_batch_size: int = 20, max_wait_s: float = 2.0,
+                 sweep_interval_s: float = 300.0, sweep_min_age_s: float = 120.0, max_attempts: int = 3):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max_wait_s
+        self.sweep_interval_s = sweep_interval_s
+        self.sweep_min_age_s = sweep_min_age_s
+        self.max_attempts = max(1, max_attempts)
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._attempts: Dict[int, int] = {}
+        self._next_sweep = 0.0
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batch_sizes = metrics.histogram("summary_batch_size", [1, 2, 5, 10, 20, 50])
+        self.failures = metrics.counter("summary_batch_failures")
+        self.swept = metrics.counter("summary_swept_messages")
+        self.given_up = metrics.counter("summary_given_up_messages")
+
+    def enqueue(self, row: dict):
+        """`row` is a chat_messages row as returned by the insert."""
+        if not (row.get("message") or "").strip():
+            return
+        self._ensure_worker()
+        self._queue.put(row)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="summary-queue", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[dict]:
+        # Waits for the first row at most until the next sweep is due
+        try:
+            first = self._queue.get(timeout=max(0.01, self._next_sweep - time.monotonic()))
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _sweep(self):
+        resp = supabase.rpc("claim_pending_summaries", {
+            "p_min_age_s": self.sweep_min_age_s,
+            "p_lease_s":   self.sweep_interval_s,
+            "p_limit":     self.max_batch_size * 5,
+        }).execute()
+        rows = resp.data or []
+        blank = [row for row in rows if not (row.get("message") or "").strip()]
+        if blank:
+            self._give_up(blank)
+        for row in rows:
+            if (row.get("message") or "").strip():
+                self._queue.put(row)
+        self.swept.inc(len(rows) - len(blank))
+
+    @staticmethod
+    def _write(summaries: List[dict]) -> List[dict]:
+        # Only the summary column is written, and only where it is still NULL
+        resp = supabase.rpc("set_chat_summaries", {"p_rows": summaries}).execute()
+        return resp.data or []
+
+    def _give_up(self, rows: List[dict]):
+        try:
+            self._write([{"id": row["id"], "summary": ""} for row in rows])
+        except Exception as e:
+            # Still pending, so a later sweep claims them again
+            print(f"⚠️ Failed to mark {len(rows)} chat messages as unsummarized: {e}")
+        for row in rows:
+            self._attempts.pop(row["id"], None)
+        self.given_up.inc(len(rows))
+
+    def _process(self, batch: List[dict]):
+        self.batch_sizes.observe(len(batch))
+        try:
+            summaries = summarize_messages([row["message"] for row in batch])
+            rows = self._write([
+                {"id": row["id"], "summary": summary}
+                for row, summary in zip(batch, summaries)
+            ])
+        except Exception as e:
+            # Rows keep a NULL summary until a sweep retries them; history
+            # falls back to the message text meanwhile
+            self.failures.inc()
+            exhausted = []
+            for row in batch:
+                self._attempts[row["id"]] = self._attempts.get(row["id"], 0) + 1
+                if self._attempts[row["id"]] >= self.max_attempts:
+                    exhausted.append(row)
+            print(f"⚠️ Failed to summarize {len(batch)} chat messages: {e}")
+            if exhausted:
+                self._give_up(exhausted)
+            return
+        for row in batch:
+            self._attempts.pop(row["id"], None)
+        conversation_memory.update_excerpts(rows)
+
+    def _run(self):
+        while True:
+            if time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.sweep_interval_s
+                try:
+                    self._sweep()
+                except Exception as e:
+                    print(f"⚠️ Pending summary sweep failed: {e}")
+            batch = self._collect()
+            if batch:
+                self._process(batch)
+
+
+summary_queue = SummaryQueue(
+    max_batch_size=SUMMARY_BATCH_SIZE,
+    max_wait_s=SUMMARY_BATCH_WAIT_S,
+    sweep_interval_s=SUMMARY_SWEEP_INTERVAL_S,
+    sweep_min_age_s=SUMMARY_SWEEP_MIN_AGE_S,
+    max_attempts=SUMMARY_MAX_ATTEMPTS,
+)
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.utils import metrics
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe, size-bounded cache with least-recently-used eviction and a
+    per-entry time-to-live. Hits, misses and evictions are counted in the
+    metrics registry as `<name>_cache_hits` / `_misses` / `_evictions`, along
+    with `<name>_cache_hit_rate` and `<name>_cache_size` gauges.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept.
+        ttl (float): Default lifetime of an entry in seconds.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(f"{name}_cache_hits")
+        self.misses = metrics.counter(f"{name}_cache_misses")
+        self.evictions = metrics.counter(f"{name}_cache_evictions")
+        metrics.gauge(f"{name}_cache_hit_rate", self.hit_rate)
+        metrics.gauge(f"{name}_cache_size", self.__len__)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits.value + self.misses.value
+        return self.hits.value / lookups if lookups else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits.inc()
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+        self.misses.inc()
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Optional
+
+from app.utils import metrics
+from app.utils.supabase_client import supabase
+
+CATALOG_TTL_S = float(os.getenv("CATALOG_TTL_S", "600"))
+
+# Reference tables that rarely change and are read on hot paths
+CATALOG_TABLES = ("symptoms", "pcos_symptoms", "diet_choices")
+
+
+class Catalog:
+    """
+    Read-only snapshot of a reference table.
+
+    Attributes:
+        rows (tuple): All rows, in database order.
+        by_id (Mapping): id → row.
+        by_name (Mapping): name → row.
+    """
+
+    def __init__(self, rows: list, loaded_at: Optional[float] = None):
+        self.rows = tuple(rows)
+        self.by_id = MappingProxyType({r["id"]: r for r in self.rows})
+        self.by_name = MappingProxyType({r["name"]: r for r in self.rows})
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+
+class CatalogCache:
+    """
+    Loads each reference table once and serves it from memory until its TTL
+    expires or `invalidate` is called after a write to that table.
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+        self._catalogs: Dict[str, Catalog] = {}
+        self._lock = threading.Lock()
+        self.loads = metrics.counter("catalog_loads")
+
+    def get(self, table: str) -> Catalog:
+        if table not in CATALOG_TABLES:
+            raise ValueError(f"{table} is not a catalog table")
+
+        catalog = self._catalogs.get(table)
+        if catalog is not None and time.monotonic() - catalog.loaded_at < self.ttl:
+            return catalog
+
+        with self._lock:
+            # Another request may have refreshed it while we waited
+            catalog = self._catalogs.get(table)
+            if catalog is None or time.monotonic() - catalog.loaded_at >= self.ttl:
+                resp = supabase.table(table).select("*").order("id").execute()
+                catalog = Catalog(resp.data or [])
+                self._catalogs[table] = catalog
+                self.loads.inc()
+        return catalog
+
+    def merge(self, table: str, rows: list):
+        """
+        Adds rows read from `table` outside the cache (e.g. created by another
+        process) to the cached snapshot without extending its TTL.
+        """
+        with self._lock:
+            catalog = self._catalogs.get(table)
+            if catalog is None:
+                return
+            new = [r for r in rows if r["id"] not in catalog.by_id]
+            if new:
+                self._catalogs[table] = Catalog(list(catalog.rows) + new, loaded_at=catalog.loaded_at)
+
+    def invalidate(self, table: Optional[str] = None):
+        with self._lock:
+            if table is None:
+                self._catalogs.clear()
+            else:
+                self._catalogs.pop(table, None)
+
+
+catalog_cache = CatalogCache(ttl=CATALOG_TTL_S)
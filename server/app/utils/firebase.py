@@ -1,10 +1,28 @@
-from fastapi import HTTPException
+import hashlib
+import os
+import time
+from fastapi import HTTPException, Request
 from firebase_admin import auth
-from app.utils.supabase_client import  supabase  # ✅ import your initialized client
+from starlette.concurrency import run_in_threadpool
+from app.utils.cache import LRUTTLCache
+from app.utils.supabase_client import  supabase, get_async_supabase  # ✅ import your initialized client
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_S = float(os.getenv("USER_CACHE_TTL_S", "60"))
 
+# sha256(token) → uid, each entry lives until the token's own `exp`
+_token_cache = LRUTTLCache("firebase_token", maxsize=TOKEN_CACHE_SIZE)
+# uid → user_accounts row
+_user_cache = LRUTTLCache("user_account", maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_S)
+
+
+def verify_firebase_token(firebase_token: str) -> str:
+    key = hashlib.sha256(firebase_token.encode()).hexdigest()
+    uid = _token_cache.get(key)
+    if uid is not None:
+        return uid
 
-def verify_firebase_and_get_user(firebase_token: str):
     try:
         decoded_token = auth.verify_id_token(firebase_token)
         uid = decoded_token.get("uid")
@@ -13,8 +31,87 @@ def verify_firebase_and_get_user(firebase_token: str):
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid Firebase token")
 
+    remaining = decoded_token.get("exp", 0) - time.time()
+    if remaining > 0:
+        _token_cache.set(key, uid, ttl=remaining)
+    return uid
+
+
+def invalidate_user(uid: str):
+    """Drop the cached user row, e.g. after auth_login creates or changes it."""
+    _user_cache.invalidate(uid)
+
+
+def get_user_by_uid(uid: str):
+    user = _user_cache.get(uid)
+    if user is not None:
+        return user
+
     response = supabase.table("user_accounts").select("*").eq("uid", uid).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return response.data[0]
\ No newline at end of file
+
+    _user_cache.set(uid, response.data[0])
+    return response.data[0]
+
+
+def verify_firebase_and_get_user(firebase_token: str):
+    return get_user_by_uid(verify_firebase_token(firebase_token))
+
+
+async def averify_firebase_and_get_user(firebase_token: str):
+    # verify_id_token is sync (and may refresh Google's public keys), keep it off the event loop
+    uid = await run_in_threadpool(verify_firebase_token, firebase_token)
+
+    user = _user_cache.get(uid)
+    if user is not None:
+        return user
+
+    client = await get_async_supabase()
+    response = await client.table("user_accounts").select("*").eq("uid", uid).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    _user_cache.set(uid, response.data[0])
+    return response.data[0]
+
+
+async def _token_from_request(request: Request):
+    # Preferred: `Authorization: Bearer <token>`
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials.strip():
+        return credentials.strip()
+
+    # Older clients send `firebase_token` in the JSON body
+    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+        try:
+            body = await request.json()
+        except Exception:
+            return None
+        if isinstance(body, dict):
+            return body.get("firebase_token")
+    return None
+
+
+async def get_firebase_token(request: Request) -> str:
+    """FastAPI dependency returning the raw token, for routes that run before a user row exists."""
+    firebase_token = await _token_from_request(request)
+    if not firebase_token:
+        raise HTTPException(status_code=401, detail="Missing Firebase token")
+    return firebase_token
+
+
+async def get_current_user(request: Request) -> dict:
+    """
+    FastAPI dependency resolving the caller's user_accounts row once per request.
+    The row is kept on `request.state.user`, so composed handlers and nested
+    dependencies reuse it instead of verifying the token again.
+    """
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
+    firebase_token = await get_firebase_token(request)
+    user = await averify_firebase_and_get_user(firebase_token)
+    request.state.user = user
+    return user
@@ -0,0 +1,44 @@
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Per-user data: clients may store it but must revalidate (cheap with If-None-Match)
+USER_DATA_CACHE_CONTROL = "private, no-cache"
+# Catalog lists annotated with the user's choices: same, but a stale copy is
+# better than an error screen on a flaky mobile connection
+CATALOG_CACHE_CONTROL = "private, no-cache, stale-if-error=86400"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so ignore any W/ prefix
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def etag_json_response(request: Request, payload: Any,
+                       cache_control: str = USER_DATA_CACHE_CONTROL) -> Response:
+    """
+    Serializes `payload` once, tags it with a strong ETag (SHA-256 of the body)
+    and answers `304 Not Modified` when the client already holds that version.
+    """
+    body = json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        # Same URL, different user → different representation
+        "Vary": "Authorization",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,173 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Canonical analyte → spellings seen on lab reports (matched case-insensitively)
+ANALYTE_ALIASES: Dict[str, List[str]] = {
+    "LH": ["lh", "luteinizing hormone", "luteinising hormone"],
+    "FSH": ["fsh", "follicle stimulating hormone", "follicle-stimulating hormone"],
+    "LH/FSH Ratio": ["lh/fsh ratio", "lh : fsh ratio", "lh:fsh ratio", "lh/fsh"],
+    "AMH": ["amh", "anti-mullerian hormone", "anti mullerian hormone", "anti-müllerian hormone",
+            "anti müllerian hormone", "antimullerian hormone"],
+    "Total Testosterone": ["total testosterone", "testosterone, total", "testosterone total", "testosterone"],
+    "Free Testosterone": ["free testosterone", "testosterone, free", "testosterone free"],
+    "SHBG": ["shbg", "sex hormone binding globulin", "sex hormone-binding globulin"],
+    "Free Androgen Index": ["free androgen index", "fai"],
+    "DHEA-S": ["dhea-s", "dheas", "dhea sulfate", "dhea sulphate", "dehydroepiandrosterone sulfate"],
+    "Prolactin": ["prolactin", "prl"],
+    "Estradiol": ["estradiol", "oestradiol", "e2"],
+    "HbA1c": ["hba1c", "hb a1c", "a1c", "glycated hemoglobin", "glycated haemoglobin",
+              "glycosylated hemoglobin", "glycosylated haemoglobin", "hemoglobin a1c", "haemoglobin a1c"],
+    # no bare "insulin"/"glucose": those lines are as often post-load or random values
+    "Fasting Insulin": ["fasting insulin", "insulin, fasting", "insulin fasting"],
+    "Fasting Glucose": ["fasting glucose", "glucose, fasting", "fasting blood sugar", "fbs",
+                        "fasting plasma glucose"],
+    "HOMA-IR": ["homa-ir", "homa ir"],
+    "TSH": ["tsh", "thyroid stimulating hormone", "thyroid-stimulating hormone", "thyrotropin"],
+    "Free T4": ["free t4", "ft4", "free thyroxine"],
+    "Total Cholesterol": ["total cholesterol", "cholesterol, total", "cholesterol total", "cholesterol"],
+    "HDL Cholesterol": ["hdl cholesterol", "hdl-cholesterol", "hdl-c", "hdl"],
+    "LDL Cholesterol": ["ldl cholesterol", "ldl-cholesterol", "ldl-c", "ldl calculated", "ldl"],
+    "Triglycerides": ["triglycerides", "triglyceride", "tg"],
+}
+
+# Longest spellings first so "free testosterone" wins over "testosterone"
+_ALIASES = sorted(
+    ((alias, name) for name, aliases in ANALYTE_ALIASES.items() for alias in aliases),
+    key=lambda pair: len(pair[0]),
+    reverse=True,
+)
+_CANONICAL = {alias: name for alias, name in _ALIASES}
+
+_UNIT = r"(?:[mµμunpf]?(?:IU|U|g|mol|Eq)\s*/\s*(?:[mµμd]?L|l|dl|ml)|mmol\s*/\s*mol|%|ratio|index)"
+
+# "<label> (<unit>)" at the start of a line, e.g. "Testosterone, Total (ng/dL)"
+_LABEL_RE = re.compile(
+    r"^[\s•*\-–·]*(?P<label>(?P<alias>" + "|".join(re.escape(a) for a, _ in _ALIASES) + r")"
+    r"(?:\s*\((?P<label_unit>[^)]*)\))?)(?=[\s:=(\-–]|$)",
+    re.IGNORECASE,
+)
+
+# "1,234" / "12,345.6" use commas as thousands separators; any other comma is a decimal point
+_NUMBER = r"(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?(?![\d,])|\d+(?:[.,]\d+)?)"
+_THOUSANDS_RE = re.compile(r"(?<![\d,.])\d{1,3}(?:,\d{3})+(?:\.\d+)?$")
+
+# what may follow the label: separator, optional assay qualifier such as
+# "3rd Generation", optional H/L flag, value, optional flag, optional
+# parenthesised reference range, optional unit. The value must end the number
+# ("3rd" is not 3) and, without a unit, must not run into a word ("TG 2019
+# report" is not a result).
+_ORDINAL = r"\d+(?:st|nd|rd|th)\b(?:\s+[A-Za-z]+)*\s*"
+_VALUE_RE = re.compile(
+    r"^\s*[:=\-–]?\s*(?:" + _ORDINAL + r")?(?:[HL]\s+)?"
+    r"(?P<value>[<>≤≥]=?\s*" + _NUMBER + r"|" + _NUMBER + r")(?![.,]?\d)"
+    r"\s*(?:\b(?:[HL]|high|low)\b|\*+)?"
+    r"\s*(?:\(\s*" + _NUMBER + r"\s*(?:[-–—]|to)\s*" + _NUMBER + r"\s*\))?"
+    r"\s*(?:(?P<unit>" + _UNIT + r")|(?!\s*[A-Za-z]))",
+    re.IGNORECASE,
+)
+# a reference range where the value should be, e.g. "2.4 - 12.6" or "2.4 to 12.6"
+_RANGE_RE = re.compile(
+    r"^\s*[:=\-–]?\s*\(?\s*" + _NUMBER + r"\s*(?:[-–—]|to)\s*" + _NUMBER,
+    re.IGNORECASE,
+)
+_UNIT_ONLY_RE = re.compile(r"^\s*(?P<unit>" + _UNIT + r")\s*$", re.IGNORECASE)
+
+# a line that carries some "name ... number" pair the LLM would otherwise read
+_CANDIDATE_RE = re.compile(r"[A-Za-z]{2,}.*?\d")
+
+
+def _format(value: str, unit: Optional[str]) -> str:
+    value = re.sub(r"\s+", "", value)
+    value = value.replace(",", "") if _THOUSANDS_RE.search(value) else value.replace(",", ".")
+    unit = re.sub(r"\s+", "", unit) if unit else ""
+    return f"{value} {unit}".strip()
+
+
+def _parse_at(lines: List[str], i: int) -> Tuple[Optional[Tuple[str, str, str]], int, Optional[str]]:
+    """
+    Tries to read one analyte starting at lines[i]. Handles "Name: value unit"
+    on one line and table layouts where PyMuPDF puts value and unit on the
+    following lines. Returns ((label, canonical, value), lines consumed, None),
+    or (None, lines consumed, text) when a known analyte is followed by a
+    reference range instead of a value; that text is left for the LLM.
+    """
+    label_match = _LABEL_RE.match(lines[i])
+    if not label_match:
+        return None, 1, None
+
+    label = label_match.group("label").strip()
+    canonical = _CANONICAL[label_match.group("alias").lower()]
+    label_unit = label_match.group("label_unit")
+    rest = lines[i][label_match.end():]
+
+    consumed = 1
+    if not rest.strip() and i + 1 < len(lines):
+        # table layout: the value sits on the next line
+        rest = lines[i + 1]
+        consumed = 2
+
+    # "LH 2.4 - 12.6 mIU/mL 15.0": which number is the result is a guess
+    if _RANGE_RE.match(rest):
+        return None, consumed, " ".join(lines[i:i + consumed])
+
+    value_match = _VALUE_RE.match(rest)
+    if not value_match:
+        return None, 1, None
+
+    unit = value_match.group("unit")
+    if not unit and consumed == 2 and i + 2 < len(lines):
+        unit_match = _UNIT_ONLY_RE.match(lines[i + 2])
+        if unit_match:
+            unit = unit_match.group("unit")
+            consumed = 3
+    if not unit and label_unit and re.fullmatch(_UNIT, label_unit.strip(), re.IGNORECASE):
+        unit = label_unit
+
+    return (label, canonical, _format(value_match.group("value"), unit)), consumed, None
+
+
+def parse_lab_values(report_text: str) -> dict:
+    """
+    Pulls "Name: value units" pairs for known PCOS-relevant analytes out of
+    report text without an LLM call.
+
+    Args:
+        report_text (str): Plain text of the report.
+
+    Returns:
+        dict: {
+            "report_values": { "<name as written>": "<value> <units>", … },
+            "analytes": { "<canonical name>": "<value> <units>", … },
+            "unparsed_lines": [ lines with a name/number pair we could not read ],
+            "coverage": share of name/number lines that were parsed (0–1),
+        }
+    """
+    lines = [line.strip() for line in report_text.splitlines() if line.strip()]
+
+    report_values: Dict[str, str] = {}
+    analytes: Dict[str, str] = {}
+    unparsed: List[str] = []
+    parsed_lines = 0
+
+    i = 0
+    while i < len(lines):
+        hit, consumed, ambiguous = _parse_at(lines, i)
+        if hit:
+            label, canonical, value = hit
+            # the first occurrence wins, later ones are usually reference tables
+            report_values.setdefault(label, value)
+            analytes.setdefault(canonical, value)
+            parsed_lines += 1
+        elif ambiguous:
+            unparsed.append(ambiguous)
+        elif _CANDIDATE_RE.search(lines[i]):
+            unparsed.append(lines[i])
+        i += consumed
+
+    candidates = parsed_lines + len(unparsed)
+    return {
+        "report_values": report_values,
+        "analytes": analytes,
+        "unparsed_lines": unparsed,
+        "coverage": parsed_lines / candidates if candidates else 0.0,
+    }
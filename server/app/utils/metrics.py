@@ -0,0 +1,86 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Union
+
+# ── Tiny in-process metrics registry, exposed as JSON on GET /metrics ─────────
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        # Cumulative counts per upper bound, Prometheus-style
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets + ["+Inf"], counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "count": count,
+            "sum": total,
+            "avg": total / count if count else 0.0,
+        }
+
+
+class Gauge:
+    """A value computed on read, e.g. a queue depth or a hit rate."""
+
+    def __init__(self, fn: Callable[[], float]):
+        self.fn = fn
+
+    def snapshot(self) -> float:
+        return self.fn()
+
+
+_registry: Dict[str, Union[Counter, Histogram, Gauge]] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str) -> Counter:
+    with _registry_lock:
+        return _registry.setdefault(name, Counter())
+
+
+def histogram(name: str, buckets: List[float]) -> Histogram:
+    with _registry_lock:
+        return _registry.setdefault(name, Histogram(buckets))
+
+
+def gauge(name: str, fn: Callable[[], float]) -> Gauge:
+    # Re-registering replaces the function, so the newest owner wins
+    with _registry_lock:
+        _registry[name] = Gauge(fn)
+        return _registry[name]
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: metric.snapshot() for name, metric in sorted(items)}
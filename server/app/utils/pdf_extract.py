@@ -0,0 +1,173 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+
+from app.utils import metrics
+
+PDF_TEXT_CACHE_DIR = os.getenv("PDF_TEXT_CACHE_DIR", "./index/pdf_text")
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or None  # None → os.cpu_count()
+# Least recently used entries are evicted past this size; 0 disables the limit
+PDF_TEXT_CACHE_MAX_MB = float(os.getenv("PDF_TEXT_CACHE_MAX_MB", "512"))
+
+cache_hits = metrics.counter("pdf_text_cache_hits")
+cache_misses = metrics.counter("pdf_text_cache_misses")
+cache_evictions = metrics.counter("pdf_text_cache_evictions")
+extract_ms = metrics.histogram("pdf_extract_ms", [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000])
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache_bytes = None  # approximate size of PDF_TEXT_CACHE_DIR, counted on first write
+_cache_lock = threading.Lock()
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the server process has live worker threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _extract_range(file_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process; each worker opens its own handle
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(PDF_TEXT_CACHE_DIR, digest[:2], f"{digest}.json")
+
+
+def _read_cache(digest: str) -> Optional[List[str]]:
+    path = _cache_path(digest)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            pages = json.load(f)["pages"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    try:
+        os.utime(path)  # mtime doubles as last use for eviction
+    except OSError:
+        pass
+    return pages
+
+
+def _cache_entries() -> List[tuple]:
+    entries = []
+    for root, _, files in os.walk(PDF_TEXT_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+    return entries
+
+
+def _evict(max_bytes: float) -> int:
+    """Deletes least recently used entries until the cache is under 90% of max_bytes. Returns the new size."""
+    entries = sorted(_cache_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+            cache_evictions.inc()
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _write_cache(digest: str, pages: List[str]):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"pages": pages}, f)
+    os.replace(tmp_path, path)
+
+    if PDF_TEXT_CACHE_MAX_MB <= 0:
+        return
+    global _cache_bytes
+    max_bytes = PDF_TEXT_CACHE_MAX_MB * 1024 * 1024
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for _, size, _ in _cache_entries())
+        else:
+            _cache_bytes += os.path.getsize(path)
+        if _cache_bytes > max_bytes:
+            _cache_bytes = _evict(max_bytes)
+
+
+def extract_pages(file_path: str, parallel: bool = True, digest: str = None) -> List[str]:
+    """
+    Text of every page of a PDF (or any file PyMuPDF opens), in page order.
+
+    Results are cached on disk under PDF_TEXT_CACHE_DIR keyed by the file's
+    SHA-256, so the same bytes are only parsed once; the cache is capped at
+    PDF_TEXT_CACHE_MAX_MB, least recently used first. Documents with at least
+    PDF_PARALLEL_MIN_PAGES pages are split into PDF_PAGES_PER_TASK-page ranges
+    parsed in a shared process pool; pass `parallel=False` when already
+    running inside a worker process.
+
+    Args:
+        file_path (str): Local path of the document.
+        parallel (bool): Allow the process pool for large documents.
+        digest (str, optional): SHA-256 of the file if the caller already has it.
+
+    Returns:
+        List[str]: One string per page.
+    """
+    digest = digest or file_sha256(file_path)
+    pages = _read_cache(digest)
+    if pages is not None:
+        cache_hits.inc()
+        return pages
+    cache_misses.inc()
+
+    start = time.perf_counter()
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+    if parallel and page_count >= PDF_PARALLEL_MIN_PAGES:
+        step = max(1, PDF_PAGES_PER_TASK)
+        starts = list(range(0, page_count, step))
+        stops = [min(s + step, page_count) for s in starts]
+        parts = _get_pool().map(_extract_range, [file_path] * len(starts), starts, stops)
+        pages = [page for part in parts for page in part]
+    else:
+        pages = _extract_range(file_path, 0, page_count)
+    extract_ms.observe((time.perf_counter() - start) * 1000)
+
+    _write_cache(digest, pages)
+    return pages
+
+
+def extract_text(file_path: str, parallel: bool = True, digest: str = None) -> str:
+    return "\n".join(extract_pages(file_path, parallel=parallel, digest=digest)).strip()
@@ -0,0 +1,7 @@
+import json
+from typing import Any
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
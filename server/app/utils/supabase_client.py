@@ -1,5 +1,19 @@
-from supabase import create_client, Client
+import asyncio
+from typing import Optional
+from supabase import create_client, Client, acreate_client, AsyncClient
 
 SUPABASE_URL =    
 SUPABASE_KEY = 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Async client for `async def` handlers; created on first use since it must be awaited
+_async_supabase: Optional[AsyncClient] = None
+_async_supabase_lock = asyncio.Lock()
+
+async def get_async_supabase() -> AsyncClient:
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_supabase_lock:
+            if _async_supabase is None:
+                _async_supabase = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return _async_supabase
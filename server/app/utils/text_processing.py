@@ -1,3 +1,5 @@
+import json
+import re
 from typing import List
 import unicodedata
 from ftfy import fix_text
@@ -19,6 +21,34 @@ def clean_text(text: str) -> str:
 
     return cleaned
 
+# Trailing text clean_text might still rewrite once more arrives: a non-ASCII
+# run (possibly the start of mojibake) with the character before it, a partial
+# HTML entity, a "\r" before a possible "\n", an unfinished terminal escape,
+# or at least the last character (a combining mark may follow). Long non-ASCII
+# runs only hold their tail.
+_STREAM_HOLD_RE = re.compile(r"(?:.?[^\x00-\x7f]{1,8}|&[#\w]*|\r|\x1b[^A-Za-z]*|.)\Z", re.DOTALL)
+
+class StreamCleaner:
+    """
+    Runs clean_text over streamed text as it arrives. `feed` returns the
+    cleaned text that can no longer change and holds back a trailing partial
+    sequence until the next delta settles it; `flush` returns the rest.
+    """
+
+    def __init__(self):
+        self.pending = ""
+
+    def feed(self, delta: str) -> str:
+        self.pending += delta
+        hold = _STREAM_HOLD_RE.search(self.pending)
+        cut = hold.start() if hold else len(self.pending)
+        ready, self.pending = self.pending[:cut], self.pending[cut:]
+        return clean_text(ready) if ready else ""
+
+    def flush(self) -> str:
+        ready, self.pending = self.pending, ""
+        return clean_text(ready) if ready else ""
+
 def summarize_individual_message(message: str) -> str:
     if len(message.strip()) <= 0:
         return ""
@@ -34,15 +64,73 @@ def summarize_individual_message(message: str) -> str:
     return response.choices[0].message.content.strip()
 
 
+def summarize_messages(messages: List[str]) -> List[str]:
+    """
+    Summarizes many chat messages with a single LLM call.
+    Returns one summary per input message, in the same order.
+    """
+    if not messages:
+        return []
+    numbered = "\n\n".join(f"[{i}] {m}" for i, m in enumerate(messages))
+    response = openai.chat.completions.create(
+        model="gpt-4.1-nano",
+        messages=[
+            {"role": "system", "content": (
+                "Summarize each numbered message concisely in under 20 words. "
+                'Reply with JSON: {"summaries": ["<summary of [0]>", "<summary of [1]>", ...]} '
+                "with exactly one entry per message, in order."
+            )},
+            {"role": "user", "content": numbered}
+        ],
+        temperature=0.3,
+        response_format={"type": "json_object"},
+    )
+    summaries = json.loads(response.choices[0].message.content).get("summaries", [])
+    if len(summaries) != len(messages):
+        raise ValueError(f"Expected {len(messages)} summaries, got {len(summaries)}")
+    return [str(s).strip() for s in summaries]
+
+
+def compact_summary(summary: str, max_tokens: int) -> str:
+    """
+    Rewrites a running conversation summary so it fits in `max_tokens`,
+    keeping what matters for later turns (symptoms, treatments, goals).
+    """
+    response = openai.chat.completions.create(
+        model="gpt-4.1-nano",
+        messages=[
+            {"role": "system", "content": (
+                f"Condense this running summary of a chat with a PCOS patient to under {max_tokens} tokens. "
+                "Keep facts about the user (symptoms, diagnoses, medications, goals, preferences) "
+                "and open questions; drop small talk. Reply with the summary only."
+            )},
+            {"role": "user", "content": summary}
+        ],
+        temperature=0.3,
+        max_tokens=max_tokens,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def summary_or_excerpt(row: dict, max_words: int = 20) -> str:
+    # Rows are stored before their summary is generated; fall back to the message itself
+    if row.get("summary"):
+        return row["summary"]
+    words = (row.get("message") or "").split()
+    return " ".join(words[:max_words]) + (" …" if len(words) > max_words else "")
+
+
 def build_conversation_history(user_id: str) -> List[dict]:
-    # 1) Fetch up to 50 of the oldest-first messages
+    # Full rebuild from chat_messages, used for users without a conversation_memory row
+
+    # 1) Fetch the 50 most recent messages, oldest first
     resp = supabase.table("chat_messages")\
         .select("*")\
         .eq("user_id", user_id)\
-        .order("id", desc=False)\
+        .order("id", desc=True)\
         .limit(50)\
         .execute()
-    history = resp.data or []
+    history = list(reversed(resp.data or []))
 
     # 2) Group into “interactions” of (user_message, ai_message)
     interactions = []
@@ -80,10 +168,10 @@ def build_conversation_history(user_id: str) -> List[dict]:
     # 5) Build one combined summary from all early interactions’ summaries
     early_summaries = []
     for u, a in early_ints:
-        if u and u.get("summary"):
-            early_summaries.append(u["summary"])
-        if a and a.get("summary"):
-            early_summaries.append(a["summary"])
+        if u:
+            early_summaries.append(summary_or_excerpt(u))
+        if a:
+            early_summaries.append(summary_or_excerpt(a))
     combined = " ".join(early_summaries).strip()
 
     # 6) Start with a system message containing that combined summary
@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import PointIdsList, PointStruct, ScoredPoint
+
+
+# A search hit is (point_id, score, payload) – payload holds {"text", "metadata"}
+Hit = Tuple[str, float, dict]
+
+
+class QdrantVectorStore:
+    """
+    Vector store backed by a remote Qdrant collection.
+    """
+
+    def __init__(self, client: QdrantClient, collection_name: str, async_client: AsyncQdrantClient = None):
+        self.client = client
+        self.async_client = async_client
+        self.collection_name = collection_name
+
+    def exists(self) -> bool:
+        collections = [col.name for col in self.client.get_collections().collections]
+        return self.collection_name in collections
+
+    def create(self, dim: int):
+        if self.exists():
+            return
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config={"size": dim, "distance": "Cosine"},
+        )
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[dict]):
+        points = [
+            PointStruct(id=pid, vector=vec, payload=payload)
+            for pid, vec, payload in zip(ids, vectors, payloads)
+        ]
+        self.client.upsert(collection_name=self.collection_name, points=points)
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=ids),
+        )
+
+    def commit(self):
+        # Qdrant applies writes as they arrive, nothing to flush
+        pass
+
+    def reload(self):
+        # Reads always go to the server, nothing cached locally
+        pass
+
+    def point_ids(self) -> List[str]:
+        ids, offset = [], None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def search(self, query_vec: List[float], top_k: int) -> List[Hit]:
+        results: List[ScoredPoint] = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_vec,
+            limit=top_k,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [(str(hit.id), hit.score, hit.payload or {}) for hit in results]
+
+    async def asearch(self, query_vec: List[float], top_k: int) -> List[Hit]:
+        if self.async_client is None:
+            raise RuntimeError("QdrantVectorStore was created without an async client")
+        results: List[ScoredPoint] = await self.async_client.search(
+            collection_name=self.collection_name,
+            query_vector=query_vec,
+            limit=top_k,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [(str(hit.id), hit.score, hit.payload or {}) for hit in results]
+
+
+class LocalVectorStore:
+    """
+    In-process vector store for small corpora.
+
+    All chunk embeddings live in one contiguous (n, dim) matrix saved as
+    `vectors.npy` and opened with `mmap_mode="r"`, so the OS page cache holds
+    the data and a query is a single matrix-vector product plus `argpartition`.
+    Vectors are L2-normalised on write, which makes the dot product equal to the
+    cosine similarity Qdrant reports for the "Cosine" distance.
+
+    Writes are staged in memory and only hit disk on `commit()`, which swaps the
+    new files in atomically.
+    """
+
+    def __init__(self, index_dir: str, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported local index dtype: {dtype}")
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._vectors = None        # np.memmap of shape (n, dim)
+        self._ids: List[str] = []
+        self._payloads: List[dict] = []
+        self._staged = None         # (ids, vectors, payloads) while writing
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.npy")
+
+    @property
+    def _payloads_path(self) -> str:
+        return os.path.join(self.index_dir, "payloads.json")
+
+    def _load(self):
+        if not (os.path.exists(self._vectors_path) and os.path.exists(self._payloads_path)):
+            return
+        with open(self._payloads_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        vectors = np.load(self._vectors_path, mmap_mode="r")
+        with self._lock:
+            self._vectors = vectors
+            self._ids = [r["id"] for r in records]
+            self._payloads = [r["payload"] for r in records]
+
+    def exists(self) -> bool:
+        return self._vectors is not None
+
+    def reload(self):
+        """Re-opens the files on disk, e.g. after another process committed to them."""
+        if self._staged is None:
+            self._load()
+
+    def create(self, dim: int):
+        if self._vectors is None and self._staged is None:
+            self._staged = ([], np.empty((0, dim), dtype=self.dtype), [])
+
+    def _stage(self):
+        if self._staged is None:
+            if self._vectors is None:
+                raise RuntimeError("Local index does not exist; call create() first")
+            self._staged = (list(self._ids), np.array(self._vectors), list(self._payloads))
+        return self._staged
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[dict]):
+        staged_ids, staged_vecs, staged_payloads = self._stage()
+
+        new = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(new, axis=1, keepdims=True)
+        new = (new / np.maximum(norms, 1e-12)).astype(self.dtype)
+
+        # an id repeated within the batch keeps its last row, as in Qdrant
+        last_row: Dict[str, int] = {pid: row for row, pid in enumerate(ids)}
+
+        position: Dict[str, int] = {pid: i for i, pid in enumerate(staged_ids)}
+        appended = []
+        for pid, row in last_row.items():
+            if pid in position:
+                staged_vecs[position[pid]] = new[row]
+                staged_payloads[position[pid]] = payloads[row]
+            else:
+                position[pid] = len(staged_ids)
+                staged_ids.append(pid)
+                staged_payloads.append(payloads[row])
+                appended.append(row)
+
+        if appended:
+            staged_vecs = np.concatenate([staged_vecs, new[appended]])
+        self._staged = (staged_ids, staged_vecs, staged_payloads)
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        staged_ids, staged_vecs, staged_payloads = self._stage()
+        doomed = set(ids)
+        keep = [i for i, pid in enumerate(staged_ids) if pid not in doomed]
+        self._staged = (
+            [staged_ids[i] for i in keep],
+            staged_vecs[keep],
+            [staged_payloads[i] for i in keep],
+        )
+
+    def point_ids(self) -> List[str]:
+        if self._staged is not None:
+            return list(self._staged[0])
+        with self._lock:
+            return list(self._ids)
+
+    def commit(self):
+        if self._staged is None:
+            return
+        ids, vectors, payloads = self._staged
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        tmp_vectors = self._vectors_path + ".tmp.npy"
+        tmp_payloads = self._payloads_path + ".tmp"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=self.dtype))
+        with open(tmp_payloads, "w", encoding="utf-8") as f:
+            json.dump([{"id": pid, "payload": p} for pid, p in zip(ids, payloads)], f)
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_payloads, self._payloads_path)
+
+        self._staged = None
+        self._load()
+
+    def search(self, query_vec: List[float], top_k: int) -> List[Hit]:
+        with self._lock:
+            vectors, ids, payloads = self._vectors, self._ids, self._payloads
+        if vectors is None or len(ids) == 0:
+            return []
+
+        query = np.asarray(query_vec, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        # float16 matrices are upcast on the fly, scores are always float32
+        scores = vectors @ query
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i]), payloads[i]) for i in top]
+
+    async def asearch(self, query_vec: List[float], top_k: int) -> List[Hit]:
+        # A single in-memory matmul, cheaper than a hop to a worker thread
+        return self.search(query_vec, top_k)
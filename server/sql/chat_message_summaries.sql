@@ -0,0 +1,49 @@
+-- Summary bookkeeping for app/summary_queue.py. A summary of '' means the
+-- queue gave up on the message; history then uses the message's first words.
+
+-- When a replica claimed a pending row for its sweep. A claim older than the
+-- lease is treated as abandoned (the replica died) and can be taken again.
+alter table chat_messages add column if not exists summary_claimed_at timestamp with time zone;
+
+create index if not exists chat_messages_pending_summary_idx
+  on chat_messages (id) where summary is null;
+
+-- Claim up to p_limit rows still pending after p_min_age_s seconds and not
+-- claimed within the last p_lease_s seconds. skip locked lets every replica
+-- sweep at once without two of them taking the same row.
+create or replace function claim_pending_summaries(
+  p_min_age_s double precision,
+  p_lease_s   double precision,
+  p_limit     integer
+) returns table (id bigint, user_id integer, sender text, message text)
+language sql
+as $$
+  update chat_messages m
+     set summary_claimed_at = now()
+   where m.id in (
+     select c.id
+       from chat_messages c
+      where c.summary is null
+        and c.created_at < now() - make_interval(secs => p_min_age_s)
+        and (c.summary_claimed_at is null
+             or c.summary_claimed_at < now() - make_interval(secs => p_lease_s))
+      order by c.id
+      limit p_limit
+      for update skip locked
+   )
+  returning m.id, m.user_id, m.sender, m.message;
+$$;
+
+-- Fill in summaries without touching any other column. Rows that were
+-- deleted or already have a summary are skipped; the updated rows come back.
+create or replace function set_chat_summaries(p_rows jsonb)
+returns table (id bigint, user_id integer, sender text, message text, summary text)
+language sql
+as $$
+  update chat_messages m
+     set summary = r.summary
+    from jsonb_to_recordset(p_rows) as r(id bigint, summary text)
+   where m.id = r.id
+     and m.summary is null
+  returning m.id, m.user_id, m.sender, m.message, m.summary;
+$$;
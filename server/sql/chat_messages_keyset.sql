@@ -0,0 +1,3 @@
+-- Backs keyset pagination in /chat-get-message: every page is a range scan
+-- on (user_id, id) whichever direction it goes.
+create index if not exists chat_messages_user_id_id_idx on chat_messages (user_id, id);
@@ -0,0 +1,87 @@
+-- Per-user rolling chat memory: a compact summary of older turns plus a ring
+-- buffer of the most recent ones. Maintained by app/conversation_memory.py.
+create table if not exists conversation_memory (
+  user_id    integer primary key references user_accounts(id) on delete cascade,
+  summary    text    not null default '',
+  recent     jsonb   not null default '[]'::jsonb,  -- [{"id", "role", "content", "excerpt"}], oldest first
+  version    bigint  not null default 0,            -- bumped on every append, guards compaction
+  updated_at timestamp with time zone not null default now()
+);
+
+-- Append one turn; turns pushed out of the ring buffer leave their excerpt in
+-- the summary. Row-locked, so concurrent appends for a user never lose a turn.
+-- A user's first append seeds the row from their 50 most recent earlier
+-- messages, so existing chat history carries over.
+create or replace function append_conversation_memory(
+  p_user_id integer,
+  p_turn    jsonb,
+  p_keep    integer
+) returns conversation_memory
+language plpgsql
+as $$
+declare
+  mem     conversation_memory;
+  created boolean;
+begin
+  insert into conversation_memory (user_id) values (p_user_id)
+  on conflict (user_id) do nothing;
+  created := found;
+
+  select * into mem from conversation_memory where user_id = p_user_id for update;
+
+  if created then
+    select coalesce(jsonb_agg(jsonb_build_object(
+             'id',      c.id,
+             'role',    case when c.sender = 'ai' then 'assistant' else 'user' end,
+             'content', c.message,
+             'excerpt', case when c.sender = 'ai' then 'AI: ' else 'User: ' end ||
+                        coalesce(nullif(c.summary, ''),
+                                 array_to_string((regexp_split_to_array(trim(c.message), '\s+'))[1:20], ' '))
+           ) order by c.id), '[]'::jsonb)
+    into mem.recent
+    from (
+      select id, sender, message, summary
+      from chat_messages
+      where user_id = p_user_id and id < (p_turn ->> 'id')::bigint
+      order by id desc
+      limit 50
+    ) c;
+  end if;
+
+  mem.recent := mem.recent || jsonb_build_array(p_turn);
+  while jsonb_array_length(mem.recent) > p_keep loop
+    mem.summary := trim(mem.summary || ' ' || coalesce(mem.recent -> 0 ->> 'excerpt', ''));
+    mem.recent  := mem.recent - 0;
+  end loop;
+
+  update conversation_memory
+  set summary = mem.summary, recent = mem.recent, version = version + 1, updated_at = now()
+  where user_id = p_user_id
+  returning * into mem;
+
+  return mem;
+end;
+$$;
+
+-- Swap in LLM summaries for the excerpts of turns still in the ring buffer.
+-- Called by the summary queue once a batch is summarized; p_turns is
+-- [{"user_id", "id", "excerpt"}, ...]. Turns already folded into the summary
+-- keep the excerpt they were folded with.
+create or replace function set_conversation_memory_excerpts(p_turns jsonb)
+returns void
+language sql
+as $$
+  update conversation_memory m
+  set recent = (
+    select jsonb_agg(
+             case when e.value is null then t.turn
+                  else t.turn || jsonb_build_object('excerpt', e.value ->> 'excerpt')
+             end
+             order by t.ord)
+    from jsonb_array_elements(m.recent) with ordinality as t(turn, ord)
+    left join jsonb_array_elements(p_turns) as e(value)
+      on (e.value ->> 'id') = (t.turn ->> 'id')
+  )
+  where m.user_id in (select distinct (value ->> 'user_id')::integer from jsonb_array_elements(p_turns))
+    and jsonb_array_length(m.recent) > 0;
+$$;
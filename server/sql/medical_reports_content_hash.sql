@@ -0,0 +1,13 @@
+-- Content-hash deduplication of uploaded medical reports (app/report_jobs.py).
+
+-- SHA-256 of the uploaded file, filled in by the report worker
+alter table medical_reports add column if not exists content_hash text;
+create index if not exists medical_reports_user_hash_idx on medical_reports (user_id, content_hash);
+
+-- Optional cross-user cache of the extraction step only (REPORT_EXTRACTION_CACHE=1).
+-- Holds extracted values/findings for identical files, never per-user advice.
+create table if not exists report_extractions (
+  content_hash text primary key,
+  extraction   jsonb not null,
+  created_at   timestamp with time zone not null default now()
+);
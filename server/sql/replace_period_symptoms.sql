@@ -0,0 +1,58 @@
+-- Replace the symptoms logged for one period in a single transaction.
+-- Called from POST /period-symptoms/update via supabase.rpc(...).
+
+-- symptom names must be unique so missing ones can be inserted with ON CONFLICT.
+-- Existing duplicates (from the old select-then-insert path) are merged into
+-- the lowest id first, otherwise the index cannot be built.
+update period_symptoms ps
+set symptom_id = keep.id
+from symptoms dup
+join (select name, min(id) as id from symptoms group by name) keep on keep.name = dup.name
+where ps.symptom_id = dup.id and dup.id <> keep.id;
+
+-- merging can leave the same symptom twice on one period
+delete from period_symptoms a
+using period_symptoms b
+where a.period_id = b.period_id and a.symptom_id = b.symptom_id and a.ctid > b.ctid;
+
+delete from symptoms dup
+using symptoms keep
+where dup.name = keep.name and dup.id > keep.id;
+
+create unique index if not exists symptoms_name_key on symptoms (name);
+
+create or replace function replace_period_symptoms(
+  p_user_id   integer,
+  p_period_id integer,
+  p_names     text[],
+  p_notes     text default null
+) returns integer
+language plpgsql
+as $$
+declare
+  inserted integer;
+begin
+  perform 1 from periods where id = p_period_id and user_id = p_user_id;
+  if not found then
+    raise exception 'Period not found' using errcode = 'P0002';
+  end if;
+
+  if p_notes is not null then
+    update periods set notes = p_notes, updated_at = now() where id = p_period_id;
+  end if;
+
+  insert into symptoms (name)
+  select distinct n from unnest(p_names) as n
+  on conflict (name) do nothing;
+
+  delete from period_symptoms where period_id = p_period_id;
+
+  insert into period_symptoms (period_id, symptom_id, severity)
+  select p_period_id, s.id, 1
+  from symptoms s
+  where s.name = any(p_names);
+  get diagnostics inserted = row_count;
+
+  return inserted;
+end;
+$$;
@@ -0,0 +1,81 @@
+-- Constraints and helpers that let body-data and period-calendar writes run
+-- as a single upsert. Apply once in the Supabase SQL editor.
+
+-- body_data_user is keyed by user_id with zero defaults (see supabase_schema.txt).
+-- Return the user's body data, creating the default row on first access.
+-- Concurrent first calls both land on the same row thanks to ON CONFLICT.
+create or replace function get_or_create_body_data(p_user_id integer)
+returns setof body_data_user
+language plpgsql
+as $$
+begin
+  insert into body_data_user (user_id) values (p_user_id)
+  on conflict (user_id) do nothing;
+  return query select * from body_data_user where user_id = p_user_id;
+end;
+$$;
+
+-- periods: one row per user and calendar month
+alter table periods add column if not exists period_month date;
+alter table periods alter column created_at set default now();
+update periods
+set period_month = date_trunc('month', start_date)::date
+where period_month is null;
+
+-- Periods a user already has twice in one month (possible with the old
+-- select-then-insert path) are merged into the lowest id first, otherwise the
+-- index cannot be built: the kept row spans all their dates, keeps all their
+-- notes and takes over their symptoms.
+with merged as (
+  select min(id) as id,
+         min(start_date) as start_date,
+         max(end_date) as end_date,
+         string_agg(notes, E'\n' order by id) as notes
+  from periods
+  where period_month is not null
+  group by user_id, period_month
+  having count(*) > 1
+)
+update periods p
+set start_date = merged.start_date,
+    end_date   = merged.end_date,
+    notes      = merged.notes
+from merged
+where p.id = merged.id;
+
+update period_symptoms ps
+set period_id = keep.id
+from periods dup
+join (select user_id, period_month, min(id) as id from periods group by user_id, period_month) keep
+  on keep.user_id = dup.user_id and keep.period_month = dup.period_month
+where ps.period_id = dup.id and dup.id <> keep.id;
+
+-- merging can leave the same symptom twice on one period
+delete from period_symptoms a
+using period_symptoms b
+where a.period_id = b.period_id and a.symptom_id = b.symptom_id and a.ctid > b.ctid;
+
+delete from periods dup
+using periods keep
+where dup.user_id = keep.user_id and dup.period_month = keep.period_month and dup.id > keep.id;
+
+create unique index if not exists periods_user_month_key on periods (user_id, period_month);
+
+-- Insert or update the user's period for one month in a single statement and
+-- say which it was (xmax is 0 only for a freshly inserted row version).
+create or replace function upsert_period(
+  p_user_id      integer,
+  p_period_month date,
+  p_start_date   date,
+  p_end_date     date
+) returns table (id integer, created boolean)
+language sql
+as $$
+  insert into periods as p (user_id, period_month, start_date, end_date, updated_at)
+  values (p_user_id, p_period_month, p_start_date, p_end_date, now())
+  on conflict (user_id, period_month) do update
+    set start_date = excluded.start_date,
+        end_date   = excluded.end_date,
+        updated_at = excluded.updated_at
+  returning p.id, (p.xmax = 0) as created;
+$$;
@@ -0,0 +1,9 @@
+-- Idempotency log for POST /sync. One row per applied client mutation;
+-- a resent key is answered from here instead of being applied twice.
+create table if not exists sync_mutations (
+  user_id         integer not null references user_accounts(id) on delete cascade,
+  idempotency_key text    not null,
+  result          jsonb,
+  created_at      timestamp with time zone not null default now(),
+  primary key (user_id, idempotency_key)
+);
@@ -0,0 +1,71 @@
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import LRUTTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_returns_default_on_miss():
+    cache = LRUTTLCache("test_miss", maxsize=4, ttl=60)
+    assert cache.get("a") is None
+    assert cache.get("a", "fallback") == "fallback"
+
+
+def test_set_then_get_counts_hits_and_misses():
+    cache = LRUTTLCache("test_hits", maxsize=4, ttl=60)
+    cache.get("a")
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.hits.value == 1
+    assert cache.misses.value == 1
+    assert cache.hit_rate() == 0.5
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUTTLCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")          # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.evictions.value == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUTTLCache("test_ttl", maxsize=4, ttl=10)
+    cache.set("a", 1)
+    clock[0] += 9.9
+    assert cache.get("a") == 1
+    clock[0] += 0.2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = LRUTTLCache("test_entry_ttl", maxsize=4, ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2)
+    clock[0] += 5
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_invalidate_and_clear():
+    cache = LRUTTLCache("test_clear", maxsize=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+from app.utils import catalog  # noqa: E402
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args):
+        return self
+
+    def order(self, *args):
+        return self
+
+    def execute(self):
+        return type("Resp", (), {"data": list(self.rows)})()
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+
+    def table(self, name):
+        self.loads += 1
+        return FakeTable(self.rows)
+
+
+def test_merge_adds_rows_without_a_reload_or_a_longer_ttl(monkeypatch):
+    db = FakeSupabase([{"id": 1, "name": "cramps"}])
+    monkeypatch.setattr(catalog, "supabase", db)
+    cache = catalog.CatalogCache(ttl=600)
+
+    loaded_at = cache.get("symptoms").loaded_at
+    cache.merge("symptoms", [{"id": 1, "name": "cramps"}, {"id": 2, "name": "bloating"}])
+    merged = cache.get("symptoms")
+
+    assert db.loads == 1
+    assert merged.by_id[2]["name"] == "bloating"
+    assert merged.by_name["bloating"]["id"] == 2
+    assert [r["id"] for r in merged.rows] == [1, 2]
+    assert merged.loaded_at == loaded_at
+
+
+def test_merge_before_the_first_load_is_ignored(monkeypatch):
+    db = FakeSupabase([{"id": 1, "name": "cramps"}])
+    monkeypatch.setattr(catalog, "supabase", db)
+    cache = catalog.CatalogCache(ttl=600)
+
+    cache.merge("symptoms", [{"id": 2, "name": "bloating"}])
+
+    assert [r["id"] for r in cache.get("symptoms").rows] == [1]
@@ -0,0 +1,62 @@
+from app.models.chat import ChatGetResponse
+
+
+def rows(ids):
+    return [
+        {"id": i, "sender": "user" if i % 2 else "ai", "message": f"m{i}", "created_at": "2025-01-01T00:00:00"}
+        for i in ids
+    ]
+
+
+def ids(page):
+    return [m.id for m in page.messages]
+
+
+def test_newest_page_is_returned_oldest_first():
+    # no cursor: scanned newest first, limit + 1 rows
+    page = ChatGetResponse.from_rows(rows([10, 9, 8, 7]), limit=3)
+    assert ids(page) == [8, 9, 10]
+    assert page.has_more is True
+    assert page.before_cursor == 8
+    assert page.after_cursor == 10
+
+
+def test_last_page_has_no_more():
+    page = ChatGetResponse.from_rows(rows([2, 1]), limit=3, before=3)
+    assert ids(page) == [1, 2]
+    assert page.has_more is False
+    assert (page.before_cursor, page.after_cursor) == (1, 2)
+
+
+def test_after_cursor_pages_forward_in_scan_order():
+    page = ChatGetResponse.from_rows(rows([11, 12, 13]), limit=2, after=10)
+    assert ids(page) == [11, 12]
+    assert page.has_more is True
+    assert (page.before_cursor, page.after_cursor) == (11, 12)
+
+
+def test_empty_page_keeps_the_cursor_it_was_asked_with():
+    before = ChatGetResponse.from_rows([], limit=20, before=5)
+    assert before.messages == [] and before.has_more is False
+    assert (before.before_cursor, before.after_cursor) == (5, None)
+
+    after = ChatGetResponse.from_rows([], limit=20, after=42)
+    assert (after.before_cursor, after.after_cursor) == (None, 42)
+
+
+def test_pages_chain_without_gaps_or_overlap():
+    history = list(range(1, 8))  # ids 1..7
+    limit = 3
+
+    def scan_before(cursor):
+        older = [i for i in reversed(history) if cursor is None or i < cursor]
+        return rows(older[:limit + 1])
+
+    seen, cursor = [], None
+    while True:
+        page = ChatGetResponse.from_rows(scan_before(cursor), limit, before=cursor)
+        seen = ids(page) + seen
+        if not page.has_more:
+            break
+        cursor = page.before_cursor
+    assert seen == history
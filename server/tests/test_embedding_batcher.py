@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def test_each_caller_gets_its_own_vector():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=20)
+    assert batcher.embed(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+
+
+def test_concurrent_queries_share_one_encode():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit("x" * n) for n in range(1, 6)]
+    assert [f.result(timeout=5) for f in futures] == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert encoder.calls == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+
+
+def test_batches_never_exceed_max_batch_size():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=50)
+    futures = [batcher.submit(str(n)) for n in range(5)]
+    for f in futures:
+        f.result(timeout=5)
+    assert all(len(call) <= 2 for call in encoder.calls)
+    assert sum(len(call) for call in encoder.calls) == 5
+
+
+def test_encode_errors_reach_every_caller_in_the_batch():
+    def failing(texts):
+        raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingBatcher(failing, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            f.result(timeout=5)
+
+
+def test_aembed_one():
+    batcher = EmbeddingBatcher(RecordingEncoder(), max_batch_size=8, max_wait_ms=5)
+    assert asyncio.run(batcher.aembed_one("abcd")) == [4.0]
+
+
+def test_cancelled_request_does_not_stop_the_worker():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(texts):
+        started.set()
+        release.wait(5)
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingBatcher(slow, max_batch_size=8, max_wait_ms=1)
+
+    async def cancel_one():
+        busy = batcher.submit("busy")  # holds the worker while the next call queues
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task = asyncio.ensure_future(batcher.aembed_one("gone"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+        return busy.result(timeout=5)
+
+    assert asyncio.run(cancel_one()) == [4.0]
+    assert batcher.submit("again").result(timeout=5) == [5.0]
+
+
+def test_worker_survives_a_malformed_encoder_result():
+    calls = []
+
+    def encoder(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            return None  # not iterable
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=1)
+    with pytest.raises(TypeError):
+        batcher.submit("first").result(timeout=5)
+    assert batcher.submit("second").result(timeout=5) == [1.0]
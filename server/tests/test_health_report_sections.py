@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("tiktoken")
+pytest.importorskip("fitz")
+pytest.importorskip("openai")
+
+from app.agents.health_report_agent import HealthReportAgent  # noqa: E402
+
+
+@pytest.fixture
+def agent():
+    agent = HealthReportAgent()
+    # one token per word keeps the budgets readable
+    agent.estimate_tokens = lambda text: len(text.split())
+    return agent
+
+
+def test_blocks_are_packed_in_order_without_splitting(agent):
+    blocks = ["a b c", "d e", "f g h i", "j"]
+    assert agent.split_sections(blocks, budget=5) == ["a b c\nd e", "f g h i\nj"]
+
+
+def test_oversized_block_is_split_on_lines(agent):
+    page = "a b c\nd e f\ng h"
+    assert agent.split_sections(["x", page], budget=4) == ["x\na b c", "d e f", "g h"]
+
+
+def test_every_section_fits_the_budget(agent):
+    lines = [" ".join(["w"] * n) for n in (3, 1, 4, 2, 2, 5, 1)]
+    sections = agent.split_sections(lines, budget=5)
+    assert all(agent.estimate_tokens(s) <= 5 for s in sections)
+    assert "\n".join(sections).splitlines() == lines
+
+
+def test_no_blocks_no_sections(agent):
+    assert agent.split_sections([], budget=5) == []
+
+
+def test_map_sections_merges_first_section_first_regardless_of_timing(agent):
+    def extract(section):
+        if section == "first":
+            time.sleep(0.05)  # finishes last
+            return {"report_values": {"LH": "15 mIU/mL", "FSH": "6 mIU/mL"}}
+        return {"report_values": {"LH": "2.4 mIU/mL", "TSH": "2 uIU/mL"}}
+
+    merged = agent.map_sections(extract, ["first", "second"])
+    assert merged == {"report_values": {"LH": "15 mIU/mL", "FSH": "6 mIU/mL", "TSH": "2 uIU/mL"}}
+
+
+def test_long_report_gets_values_per_section_and_one_findings_pass(agent):
+    agent.split_sections = lambda blocks, budget=4: HealthReportAgent.split_sections(agent, blocks, 4)
+    lock = threading.Lock()
+    value_calls, findings_calls = [], []
+
+    def extract_values(text):
+        with lock:
+            value_calls.append(text)
+        if "Vitamin" in text:
+            return {"report_values": {"Vitamin D": "18 ng/mL", "LH": "1 mIU/mL"}}
+        return {"report_values": {}}
+
+    def extract_findings(values):
+        findings_calls.append(dict(values))
+        return {"medical_findings": {"Elevated LH": {"detail": "…", "reason": "LH"}}}
+
+    agent.extract_values = extract_values
+    agent.extract_findings = extract_findings
+    agent.extract_with_llm = lambda text: pytest.fail("whole-report prompt used for a long report")
+
+    report = "LH: 15 mIU/mL\nVitamin D level 18 ng/mL ok\nComment line 2 here today"
+    stats = {}
+    result = agent.extract_medical_info(report, stats=stats)
+
+    assert len(value_calls) == 2
+    assert len(findings_calls) == 1
+    assert findings_calls[0] == {"LH": "15 mIU/mL", "Vitamin D": "18 ng/mL"}  # parser wins on LH
+    assert result == {
+        "report_values": {"LH": "15 mIU/mL", "Vitamin D": "18 ng/mL"},
+        "medical_findings": {"Elevated LH": {"detail": "…", "reason": "LH"}},
+    }
+    assert stats["sections"] == 2
+
+
+def test_short_unparsed_report_uses_one_call(agent):
+    agent.extract_with_llm = lambda text: {"report_values": {"X": "1"}, "medical_findings": {}}
+    agent.extract_values = lambda text: pytest.fail("sectioned path used for a short report")
+    assert agent.extract_medical_info("nothing we know 42")["report_values"] == {"X": "1"}
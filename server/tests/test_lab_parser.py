@@ -0,0 +1,81 @@
+from app.utils.lab_parser import parse_lab_values
+
+
+def test_reads_name_value_unit_lines():
+    parsed = parse_lab_values("LH: 15.0 mIU/mL\nFSH 6.2 mIU/mL\nHbA1c 5.4 %")
+    assert parsed["analytes"] == {"LH": "15.0 mIU/mL", "FSH": "6.2 mIU/mL", "HbA1c": "5.4 %"}
+    assert parsed["unparsed_lines"] == []
+    assert parsed["coverage"] == 1.0
+
+
+def test_longest_alias_wins():
+    parsed = parse_lab_values("Free Testosterone 2.1 pg/mL\nTestosterone 45 ng/dL")
+    assert parsed["analytes"] == {"Free Testosterone": "2.1 pg/mL", "Total Testosterone": "45 ng/dL"}
+
+
+def test_comma_followed_by_three_digits_is_a_thousands_separator():
+    parsed = parse_lab_values("DHEA-S 1,234 ug/dL\nProlactin 12,345.6 mIU/L")
+    assert parsed["analytes"]["DHEA-S"] == "1234 ug/dL"
+    assert parsed["analytes"]["Prolactin"] == "12345.6 mIU/L"
+
+
+def test_other_commas_are_decimal_points():
+    parsed = parse_lab_values("AMH: 3,2 ng/mL\nTSH < 0,45 uIU/mL")
+    assert parsed["analytes"] == {"AMH": "3.2 ng/mL", "TSH": "<0.45 uIU/mL"}
+
+
+def test_reference_range_before_value_is_left_for_the_llm():
+    parsed = parse_lab_values("LH 2.4 - 12.6 mIU/mL 15.0")
+    assert parsed["analytes"] == {}
+    assert parsed["unparsed_lines"] == ["LH 2.4 - 12.6 mIU/mL 15.0"]
+    assert parsed["coverage"] == 0.0
+
+
+def test_reference_range_after_value_is_ignored():
+    parsed = parse_lab_values("LH 15.0 mIU/mL 2.4 - 12.6")
+    assert parsed["analytes"] == {"LH": "15.0 mIU/mL"}
+
+
+def test_table_layout_value_and_unit_on_following_lines():
+    parsed = parse_lab_values("Testosterone, Total (ng/dL)\n45\n\nAMH\n3.1\nng/mL")
+    assert parsed["report_values"] == {"Testosterone, Total (ng/dL)": "45 ng/dL", "AMH": "3.1 ng/mL"}
+    assert parsed["analytes"] == {"Total Testosterone": "45 ng/dL", "AMH": "3.1 ng/mL"}
+
+
+def test_table_layout_range_on_next_line_is_unparsed():
+    parsed = parse_lab_values("LH\n2.4-12.6\nmIU/mL")
+    assert parsed["analytes"] == {}
+    assert parsed["unparsed_lines"] == ["LH 2.4-12.6"]
+
+
+def test_unqualified_insulin_and_glucose_are_not_read_as_fasting():
+    parsed = parse_lab_values("Insulin (2 hr post) 45 uIU/mL\nGlucose 140 mg/dL\nFasting Insulin 12 uIU/mL")
+    assert parsed["analytes"] == {"Fasting Insulin": "12 uIU/mL"}
+    assert parsed["unparsed_lines"] == ["Insulin (2 hr post) 45 uIU/mL", "Glucose 140 mg/dL"]
+
+
+def test_first_occurrence_wins():
+    parsed = parse_lab_values("TSH 2.1 uIU/mL\nReference table\nTSH 0.4 uIU/mL")
+    assert parsed["analytes"] == {"TSH": "2.1 uIU/mL"}
+
+
+def test_empty_report():
+    assert parse_lab_values("") == {
+        "report_values": {}, "analytes": {}, "unparsed_lines": [], "coverage": 0.0,
+    }
+
+
+def test_ordinal_qualifier_is_not_the_value():
+    parsed = parse_lab_values("TSH 3rd Generation 2.10 uIU/mL")
+    assert parsed["analytes"] == {"TSH": "2.10 uIU/mL"}
+
+
+def test_number_running_into_a_word_is_not_a_value():
+    parsed = parse_lab_values("TG 2019 report\nTriglycerides 150 mg/dL")
+    assert parsed["analytes"] == {"Triglycerides": "150 mg/dL"}
+    assert parsed["unparsed_lines"] == ["TG 2019 report"]
+
+
+def test_parenthesised_range_between_value_and_unit():
+    parsed = parse_lab_values("LH: 5.2 (2.4 - 12.6) mIU/mL")
+    assert parsed["analytes"] == {"LH": "5.2 mIU/mL"}
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("nltk")
+pytest.importorskip("fitz")
+
+from app.load_documents import batched, iter_document_files, iter_split_files  # noqa: E402
+
+
+def test_batched_yields_fixed_size_batches_and_a_remainder():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+
+def test_batched_consumes_lazily():
+    consumed = []
+
+    def source():
+        for i in range(10):
+            consumed.append(i)
+            yield i
+
+    first = next(batched(source(), 4))
+    assert first == [0, 1, 2, 3]
+    assert consumed == [0, 1, 2, 3]
+
+
+def test_iter_document_files_only_lists_supported_types(tmp_path):
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / "a.pdf").write_bytes(b"")
+    (tmp_path / "notes.md").write_text("skip")
+    assert [p.rsplit("/", 1)[-1] for p in iter_document_files(str(tmp_path))] == ["a.pdf", "b.txt"]
+
+
+def test_iter_split_files_keeps_input_order_and_reports_errors(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"Document number {i}. It has two sentences.")
+        paths.append(str(path))
+    missing = str(tmp_path / "missing.txt")
+
+    results = list(iter_split_files(paths + [missing], max_workers=2))
+
+    assert [path for path, _, _ in results] == paths + [missing]
+    for path, docs, error in results[:-1]:
+        assert error is None
+        assert docs and all(doc.metadata["source"] == path for doc in docs)
+    assert results[-1][1] == [] and results[-1][2]
@@ -0,0 +1,65 @@
+
+from app import semantic_cache as semantic_cache_module
+from app.semantic_cache import SemanticAnswerCache
+
+
+def vec(cos: float):
+    # unit vector at the given cosine from [1, 0]
+    return [cos, (1 - cos ** 2) ** 0.5]
+
+
+def test_hit_at_or_above_threshold():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.95)
+    cache.store([1.0, 0.0], ["c1", "c2"], "answer", ["doc"])
+    assert cache.lookup(vec(0.96), ["c1", "c2"]) == ("answer", ["doc"])
+
+
+def test_miss_below_threshold():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.95)
+    cache.store([1.0, 0.0], ["c1"], "answer", [])
+    assert cache.lookup(vec(0.94), ["c1"]) is None
+
+
+def test_vectors_are_normalised_before_comparing():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.99)
+    cache.store([10.0, 0.0], ["c1"], "answer", [])
+    assert cache.lookup([0.5, 0.0], ["c1"]) == ("answer", [])
+
+
+def test_requires_the_same_chunk_set_in_any_order():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.95)
+    cache.store([1.0, 0.0], ["c1", "c2"], "answer", [])
+    assert cache.lookup([1.0, 0.0], ["c2", "c1"]) == ("answer", [])
+    assert cache.lookup([1.0, 0.0], ["c1", "c3"]) is None
+    assert cache.lookup([1.0, 0.0], ["c1"]) is None
+
+
+def test_closest_entry_wins():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.9)
+    cache.store(vec(0.92), ["c1"], "far", [])
+    cache.store(vec(0.99), ["c1"], "near", [])
+    assert cache.lookup([1.0, 0.0], ["c1"])[0] == "near"
+
+
+def test_oldest_entry_is_evicted_past_maxsize():
+    cache = SemanticAnswerCache(maxsize=1, threshold=0.95)
+    cache.store([1.0, 0.0], ["c1"], "first", [])
+    cache.store([1.0, 0.0], ["c2"], "second", [])
+    assert cache.lookup([1.0, 0.0], ["c1"]) is None
+    assert cache.lookup([1.0, 0.0], ["c2"])[0] == "second"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.95, ttl=10)
+    cache.store([1.0, 0.0], ["c1"], "answer", [])
+    now[0] += 11
+    assert cache.lookup([1.0, 0.0], ["c1"]) is None
+
+
+def test_clear():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.95)
+    cache.store([1.0, 0.0], ["c1"], "answer", [])
+    cache.clear()
+    assert cache.lookup([1.0, 0.0], ["c1"]) is None
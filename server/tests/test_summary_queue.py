@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("ftfy")
+pytest.importorskip("openai")
+pytest.importorskip("tiktoken")
+pytest.importorskip("fitz")
+pytest.importorskip("supabase")
+
+from app import summary_queue as sq  # noqa: E402
+
+
+class FakeRpc:
+    """Records rpc(name, params); set_chat_summaries echoes rows still pending."""
+
+    def __init__(self, claimable=None, deleted=()):
+        self.calls = []
+        self.claimable = claimable or []
+        self.deleted = set(deleted)
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if name == "claim_pending_summaries":
+            data = self.claimable
+        else:
+            data = [
+                {"id": r["id"], "user_id": 7, "sender": "user", "message": "m", "summary": r["summary"]}
+                for r in params["p_rows"] if r["id"] not in self.deleted
+            ]
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = FakeRpc()
+    excerpts = []
+    monkeypatch.setattr(sq, "supabase", db)
+    monkeypatch.setattr(sq, "conversation_memory", SimpleNamespace(update_excerpts=excerpts.append))
+    return db, excerpts
+
+
+def row(i, message="hello"):
+    return {"id": i, "user_id": 7, "sender": "user", "message": message}
+
+
+def test_writes_only_the_summary_of_rows_that_still_exist(env, monkeypatch):
+    db, excerpts = env
+    db.deleted = {2}
+    monkeypatch.setattr(sq, "summarize_messages", lambda messages: [f"s{i}" for i in range(len(messages))])
+
+    sq.SummaryQueue()._process([row(1), row(2)])
+
+    assert db.calls == [("set_chat_summaries", {"p_rows": [{"id": 1, "summary": "s0"}, {"id": 2, "summary": "s1"}]})]
+    assert [[r["id"] for r in rows] for rows in excerpts] == [[1]]
+
+
+def test_gives_up_after_max_attempts_and_forgets_the_row(env, monkeypatch):
+    db, excerpts = env
+
+    def fail(messages):
+        raise RuntimeError("llm down")
+
+    monkeypatch.setattr(sq, "summarize_messages", fail)
+    queue = sq.SummaryQueue(max_attempts=2)
+
+    queue._process([row(1)])
+    assert queue._attempts == {1: 1}
+    assert db.calls == []
+
+    queue._process([row(1)])
+    assert queue._attempts == {}
+    assert db.calls == [("set_chat_summaries", {"p_rows": [{"id": 1, "summary": ""}]})]
+    assert excerpts == []
+
+
+def test_sweep_claims_rows_and_gives_up_on_blank_ones(env):
+    db, _ = env
+    db.claimable = [row(1), row(2, message="  ")]
+    queue = sq.SummaryQueue(max_batch_size=4, sweep_interval_s=300, sweep_min_age_s=120)
+
+    queue._sweep()
+
+    name, params = db.calls[0]
+    assert name == "claim_pending_summaries"
+    assert params == {"p_min_age_s": 120, "p_lease_s": 300, "p_limit": 20}
+    assert db.calls[1] == ("set_chat_summaries", {"p_rows": [{"id": 2, "summary": ""}]})
+    assert queue._queue.get_nowait()["id"] == 1
+    assert queue._queue.empty()
@@ -0,0 +1,227 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("supabase")
+pytest.importorskip("firebase_admin")
+
+from app.routes import sync  # noqa: E402
+from app.routes.diet import UpdateDietRequest  # noqa: E402
+from app.routes.pcos_symptoms import SymptomAddRequest  # noqa: E402
+from app.routes.period_calendar import PeriodUpdateRequest  # noqa: E402
+from app.routes.period_symptoms import PeriodSymptomsUpdateRequest  # noqa: E402
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.ops = db, table, []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+        return call
+
+    def execute(self):
+        self.db.calls.append((self.table, self.ops))
+        data = self.db.responses.get(self.table, [])
+        if callable(data):
+            data = data(self.ops)
+        return SimpleNamespace(data=data)
+
+
+class FakeSupabase:
+    """
+    Records every statement as (table, [(method, args, kwargs), ...]). A
+    response is a list, or a callable that gets the statement's ops.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def ops(self, table, method):
+        return [args for t, ops in self.calls if t == table for m, args, _ in ops if m == method]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(sync, "supabase", fake)
+    return fake
+
+
+def test_pcos_toggles_fold_to_the_last_state_per_symptom(db):
+    items = [
+        ("k1", (True, SymptomAddRequest(symptom_id=1))),
+        ("k2", (True, SymptomAddRequest(symptom_id=2))),
+        ("k3", (False, SymptomAddRequest(symptom_id=1))),
+    ]
+    out = sync.apply_pcos_symptoms(7, items)
+
+    assert db.ops("pcos_symptoms_user", "upsert") == [([{"user_id": 7, "symptom_id": 2}],)]
+    assert db.ops("pcos_symptoms_user", "in_") == [("symptom_id", [1])]
+    assert out == {
+        "k1": {"symptom_id": 1, "added": True},
+        "k2": {"symptom_id": 2, "added": True},
+        "k3": {"symptom_id": 1, "added": False},
+    }
+
+
+def test_diet_updates_replace_like_the_single_endpoint(monkeypatch):
+    written = []
+    monkeypatch.setattr(sync, "fetch_diet_ids", lambda user_id: {1, 2})
+    monkeypatch.setattr(sync, "write_diet_changes", lambda user_id, add, remove: written.append((add, remove)))
+
+    def update(*pairs):
+        return UpdateDietRequest(preferences=[{"diet_id": d, "added": a} for d, a in pairs])
+
+    out = sync.apply_diets(7, [
+        ("k1", update((2, True), (3, True))),   # 1 is not listed, so it is removed
+        ("k2", update((3, True), (4, True))),
+    ])
+
+    assert out == {
+        "k1": {"added": [3], "removed": [1]},
+        "k2": {"added": [4], "removed": [2]},
+    }
+    # one net write from {1, 2} to {3, 4}
+    assert written == [({3, 4}, {1, 2})]
+
+
+def test_period_calendar_keeps_the_last_edit_per_month(db):
+    db.responses["periods"] = [{"id": 99, "period_month": "2025-03-01"}]
+    items = [
+        ("k1", PeriodUpdateRequest(year=2025, month=3, period_dates=["2025-03-02", "2025-03-05"])),
+        ("k2", PeriodUpdateRequest(year=2025, month=3, period_dates=["2025-03-04", "2025-03-08"])),
+    ]
+    out = sync.apply_period_calendar(7, items)
+
+    (rows,), = db.ops("periods", "upsert")
+    assert len(rows) == 1
+    assert (rows[0]["start_date"], rows[0]["end_date"]) == ("2025-03-04", "2025-03-08")
+    assert out == {"k1": {"period_id": 99}, "k2": {"period_id": 99}}
+
+
+def test_period_calendar_rejects_only_the_empty_edit(db):
+    db.responses["periods"] = [{"id": 99, "period_month": "2025-03-01"}]
+    items = [
+        ("k1", PeriodUpdateRequest(year=2025, month=3, period_dates=["2025-03-02"])),
+        ("k2", PeriodUpdateRequest(year=2025, month=4, period_dates=[])),
+    ]
+    out = sync.apply_period_calendar(7, items)
+
+    (rows,), = db.ops("periods", "upsert")
+    assert [r["period_month"] for r in rows] == ["2025-03-01"]
+    assert out["k1"] == {"period_id": 99}
+    assert isinstance(out["k2"], sync.MutationRejected)
+
+
+def test_period_symptoms_skip_periods_the_user_does_not_own(db, monkeypatch):
+    db.responses["periods"] = [{"id": 1}]
+    monkeypatch.setattr(sync, "resolve_symptom_ids", lambda names: {n: i for i, n in enumerate(names, 10)})
+    items = [
+        ("k1", PeriodSymptomsUpdateRequest(period_id=1, symptoms={"cramps": True})),
+        ("k2", PeriodSymptomsUpdateRequest(period_id=2, symptoms={"bloating": True})),
+    ]
+    out = sync.apply_period_symptoms(7, items)
+
+    assert out["k1"] == {"period_id": 1}
+    assert isinstance(out["k2"], sync.MutationRejected)
+    assert db.ops("period_symptoms", "in_") == [("period_id", [1])]
+    assert db.ops("period_symptoms", "insert") == [([{"period_id": 1, "symptom_id": 10, "severity": 1}],)]
+
+
+def sync_mutations_table(stored):
+    """Claims insert only unknown keys; selects return the stored results."""
+    def respond(ops):
+        method, args, _ = ops[0]
+        if method == "upsert" and ops[0][2].get("ignore_duplicates"):
+            return [row for row in args[0] if row["idempotency_key"] not in stored]
+        if method == "select":
+            return [{"idempotency_key": k, "result": r} for k, r in stored.items()]
+        return []
+    return respond
+
+
+def test_sync_skips_keys_already_applied_and_records_new_ones(db):
+    db.responses["sync_mutations"] = sync_mutations_table({"old": {"mood": "calm"}})
+    req = sync.SyncRequest(mutations=[
+        {"idempotency_key": "old", "type": "mood.log", "payload": {"mood": "calm"}},
+        {"idempotency_key": "new", "type": "mood.log", "payload": {"mood": "happy"}},
+        {"idempotency_key": "bad", "type": "mood.log", "payload": {}},
+    ])
+
+    resp = sync.sync(req, user={"id": 7})
+
+    assert [(r.idempotency_key, r.status) for r in resp.results] == [
+        ("old", "duplicate"), ("new", "applied"), ("bad", "error"),
+    ]
+    assert db.ops("moods", "insert") == [([{"user_id": 7, "name": "happy"}],)]
+    claim, record = [args[0] for args in db.ops("sync_mutations", "upsert")]
+    # the invalid mutation is never claimed
+    assert [r["idempotency_key"] for r in claim] == ["old", "new"]
+    assert record == [{"user_id": 7, "idempotency_key": "new", "result": {"mood": "happy"}}]
+
+
+def test_sync_only_applies_keys_it_claimed(db):
+    # "racing" was claimed by a concurrent request that has not recorded a result yet
+    db.responses["sync_mutations"] = sync_mutations_table({"racing": None})
+    req = sync.SyncRequest(mutations=[
+        {"idempotency_key": "racing", "type": "mood.log", "payload": {"mood": "calm"}},
+        {"idempotency_key": "mine", "type": "mood.log", "payload": {"mood": "happy"}},
+    ])
+
+    resp = sync.sync(req, user={"id": 7})
+
+    assert [(r.idempotency_key, r.status) for r in resp.results] == [("racing", "error"), ("mine", "applied")]
+    assert db.ops("moods", "insert") == [([{"user_id": 7, "name": "happy"}],)]
+
+
+def test_sync_releases_keys_when_the_apply_fails(db, monkeypatch):
+    db.responses["sync_mutations"] = sync_mutations_table({})
+
+    def boom(user_id, items):
+        raise RuntimeError("db down")
+
+    monkeypatch.setitem(sync.APPLIERS, "moods", boom)
+    req = sync.SyncRequest(mutations=[
+        {"idempotency_key": "k1", "type": "mood.log", "payload": {"mood": "calm"}},
+    ])
+
+    resp = sync.sync(req, user={"id": 7})
+
+    assert [(r.idempotency_key, r.status) for r in resp.results] == [("k1", "error")]
+    assert len(db.ops("sync_mutations", "upsert")) == 1  # the claim, no result
+    assert db.ops("sync_mutations", "delete") == [()]
+    assert ("idempotency_key", ["k1"]) in db.ops("sync_mutations", "in_")
+
+
+def test_sync_applies_the_valid_part_of_a_group(db):
+    db.responses["sync_mutations"] = sync_mutations_table({})
+    db.responses["periods"] = [{"id": 99, "period_month": "2025-03-01"}]
+    req = sync.SyncRequest(mutations=[
+        {"idempotency_key": "ok", "type": "period_calendar.update",
+         "payload": {"year": 2025, "month": 3, "period_dates": ["2025-03-02"]}},
+        {"idempotency_key": "empty", "type": "period_calendar.update",
+         "payload": {"year": 2025, "month": 4, "period_dates": []}},
+    ])
+
+    resp = sync.sync(req, user={"id": 7})
+
+    assert [(r.idempotency_key, r.status) for r in resp.results] == [("ok", "applied"), ("empty", "error")]
+    _, record = [args[0] for args in db.ops("sync_mutations", "upsert")]
+    assert [r["idempotency_key"] for r in record] == ["ok"]
+    assert ("idempotency_key", ["empty"]) in db.ops("sync_mutations", "in_")
+
+
+def test_sync_rejects_oversized_batches(db):
+    req = sync.SyncRequest(mutations=[
+        {"idempotency_key": str(i), "type": "mood.log", "payload": {"mood": "ok"}}
+        for i in range(sync.SYNC_MAX_MUTATIONS + 1)
+    ])
+    with pytest.raises(sync.HTTPException):
+        sync.sync(req, user={"id": 7})
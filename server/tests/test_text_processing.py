@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("ftfy")
+pytest.importorskip("openai")
+pytest.importorskip("supabase")
+
+from app.utils.text_processing import StreamCleaner, clean_text  # noqa: E402
+
+
+def stream(deltas):
+    cleaner = StreamCleaner()
+    out = [cleaner.feed(d) for d in deltas]
+    out.append(cleaner.flush())
+    return out
+
+
+def test_plain_text_is_emitted_as_it_arrives_minus_the_last_character():
+    assert stream(["Hello ", "there, ", "friend"]) == ["Hello", " there,", " frien", "d"]
+
+
+def test_mojibake_split_across_deltas_is_cleaned():
+    raw = "Itâ€™s a café"
+    deltas = ["Itâ", "€", "™s a caf", "Ã", "©"]
+    out = stream(deltas)
+    assert "".join(out) == clean_text(raw)
+    assert "â" not in "".join(out) and "café" in "".join(out)
+    # nothing from the sequence is emitted before it is complete
+    assert out[:3] == ["I", "", clean_text("tâ€™s a ca")]
+
+
+def test_partial_entity_and_crlf_are_held_back():
+    out = stream(["Tom &am", "p; Jerry\r", "\nnext"])
+    assert "".join(out) == clean_text("Tom &amp; Jerry\r\nnext")
+
+
+def test_combining_mark_in_the_next_delta_still_composes():
+    assert "".join(stream(["cafe", "́ time"])) == "café time"
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from app.vector_store import LocalVectorStore  # noqa: E402
+
+
+def make_store(tmp_path, dtype="float32"):
+    store = LocalVectorStore(str(tmp_path / "index"), dtype=dtype)
+    store.create(2)
+    store.upsert(
+        ["a", "b", "c"],
+        [[1.0, 0.0], [0.6, 0.8], [0.0, 3.0]],
+        [{"text": "a"}, {"text": "b"}, {"text": "c"}],
+    )
+    store.commit()
+    return store
+
+
+def test_search_returns_best_first_with_cosine_scores(tmp_path):
+    store = make_store(tmp_path)
+    hits = store.search([1.0, 0.0], top_k=2)
+
+    assert [pid for pid, _, _ in hits] == ["a", "b"]
+    assert [score for _, score, _ in hits] == pytest.approx([1.0, 0.6])
+    assert hits[0][2] == {"text": "a"}
+
+
+def test_top_k_larger_than_the_index(tmp_path):
+    store = make_store(tmp_path)
+    assert [pid for pid, _, _ in store.search([0.0, 1.0], top_k=10)] == ["c", "b", "a"]
+
+
+def test_float16_index(tmp_path):
+    store = make_store(tmp_path, dtype="float16")
+    assert np.load(str(tmp_path / "index" / "vectors.npy")).dtype == np.float16
+
+    hits = store.search([0.6, 0.8], top_k=1)
+    assert hits[0][0] == "b"
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_upsert_updates_existing_points(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["a"], [[0.0, 1.0]], [{"text": "a2"}])
+    store.commit()
+
+    assert store.point_ids() == ["a", "b", "c"]
+    hits = {pid: (score, payload) for pid, score, payload in store.search([0.0, 1.0], 3)}
+    assert hits["a"][0] == pytest.approx(1.0)
+    assert hits["a"][1] == {"text": "a2"}
+
+
+def test_repeated_id_in_one_batch_keeps_the_last_row(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(
+        ["d", "b", "d", "b"],
+        [[1.0, 0.0], [1.0, 0.0], [0.0, 1.0], [0.0, 1.0]],
+        [{"text": "d1"}, {"text": "b1"}, {"text": "d2"}, {"text": "b2"}],
+    )
+    store.commit()
+
+    assert store.point_ids() == ["a", "b", "c", "d"]
+    payloads = {pid: (score, payload) for pid, score, payload in store.search([0.0, 1.0], 4)}
+    assert payloads["d"][1] == {"text": "d2"} and payloads["d"][0] == pytest.approx(1.0)
+    assert payloads["b"][1] == {"text": "b2"} and payloads["b"][0] == pytest.approx(1.0)
+
+
+def test_delete(tmp_path):
+    store = make_store(tmp_path)
+    store.delete(["b", "missing"])
+    store.commit()
+
+    assert store.point_ids() == ["a", "c"]
+    assert [pid for pid, _, _ in store.search([0.6, 0.8], 3)] == ["c", "a"]
+
+
+def test_writes_are_invisible_until_commit_and_survive_a_reopen(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["d"], [[1.0, 1.0]], [{"text": "d"}])
+    assert "d" not in [pid for pid, _, _ in store.search([1.0, 1.0], 4)]
+
+    store.commit()
+    reopened = LocalVectorStore(str(tmp_path / "index"))
+    assert reopened.exists()
+    assert reopened.point_ids() == ["a", "b", "c", "d"]
+    assert reopened.search([1.0, 1.0], 1)[0][0] == "d"
+
+
+def test_reload_picks_up_another_writer(tmp_path):
+    reader = make_store(tmp_path)
+    writer = LocalVectorStore(str(tmp_path / "index"))
+    writer.delete(["a"])
+    writer.commit()
+
+    assert reader.point_ids() == ["a", "b", "c"]
+    reader.reload()
+    assert reader.point_ids() == ["b", "c"]